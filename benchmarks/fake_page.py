@@ -0,0 +1,43 @@
+import asyncio
+import itertools
+import flet as ft
+from flet_core.connection import Connection
+from flet_core.protocol import PageCommandResponsePayload, PageCommandsBatchResponsePayload
+
+
+class FakeConnection(Connection):
+    """A Flet connection with no client behind it.
+
+    Commands are answered the way the Flet server answers them (``add``
+    returns fresh control ids), so pages can be built and updated headless.
+    ``commands`` counts the commands sent.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.page_name = "fake"
+        self.page_url = "http://localhost/"
+        self._ids = itertools.count(1)
+        self.commands = 0
+        self.batches = 0
+
+    def send_command(self, session_id: str, command):
+        self.commands += 1
+        return PageCommandResponsePayload(result="", error="")
+
+    def send_commands(self, session_id: str, commands):
+        self.batches += 1
+        results = []
+        for command in commands:
+            self.commands += 1 + len(command.commands)
+            if command.name == "add":
+                results.append(" ".join(f"_{next(self._ids)}" for _ in command.commands))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+
+_sessions = itertools.count(1)
+
+
+def make_page(connection: FakeConnection = None) -> ft.Page:
+    connection = connection or FakeConnection()
+    return ft.Page(connection, f"session-{next(_sessions)}", loop=asyncio.new_event_loop())
@@ -0,0 +1,218 @@
+"""Drive many simulated cashier sessions through the real App, headless.
+
+Every session logs in, rings up items with the cards' plus buttons, sends
+orders and now and then opens the dashboard, against the in-memory backend.
+Reports throughput, latency percentiles per action and the process's memory
+and CPU per session, so connection limits and machine sizes can be set from
+data.
+
+    python -m benchmarks.load --sessions 1,10,25,50 --duration 20 --output load.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+os.environ["DATA_BACKEND"] = "memory"
+os.environ.setdefault("ORDER_JOURNAL_PATH", os.path.join(tempfile.mkdtemp(prefix="load-"), "orders.db"))
+os.environ.setdefault("APP_PASSWORD_ADMIN", "load-test")
+# Without prefetching, open_dashboard measures building the tab
+os.environ.setdefault("PREFETCH_TABS", "0")
+
+# services.database first: with DATA_BACKEND=memory it imports the backend itself
+from services import database, orders
+from services.catalog import catalog
+from services.memory_backend import MemoryBackend
+from benchmarks.fake_page import FakeConnection, make_page
+from benchmarks.synthetic import seed_store
+import main as app_main
+
+DASHBOARD_TAB = 2
+FRONTBOX_TAB = 0
+
+
+def percentile(timings: list, fraction: float) -> float:
+    if not timings:
+        return 0.0
+    return timings[min(len(timings) - 1, round(fraction * (len(timings) - 1)))]
+
+
+class Session:
+    """One simulated cashier; records how long every action took."""
+
+    def __init__(self, rng: random.Random, items_per_order: int, dashboard_every: int, think_time: float):
+        self.rng = rng
+        self.items_per_order = items_per_order
+        self.dashboard_every = dashboard_every
+        self.think_time = think_time
+        self.connection = FakeConnection()
+        self.timings = {}
+        self.orders = 0
+        self.errors = 0
+        self.app = None
+
+    def timed(self, action: str, function, *args) -> bool:
+        """Run and time one action; False if it raised."""
+        start = time.perf_counter()
+        try:
+            function(*args)
+            return True
+        except Exception:
+            self.errors += 1
+            return False
+        finally:
+            self.timings.setdefault(action, []).append(time.perf_counter() - start)
+
+    def login(self):
+        page = make_page(self.connection)
+        self.timed("open", app_main.main, page)
+        self.app = page.controls[0]
+        login = self.app.content
+        login.login_input.value = "admin"
+        login.password_input.value = os.environ["APP_PASSWORD_ADMIN"]
+        self.timed("login", login.handle_login, None)
+
+    def switch_tab(self, index: int):
+        self.app.navigation_bar_admin.selected_index = index
+        self.app.change_tab_admin(SimpleNamespace(control=self.app.navigation_bar_admin))
+
+    def checkout(self):
+        frontbox = self.app.frontbox
+        cards = list(frontbox.cards.values())
+        for card in self.rng.sample(cards, min(self.items_per_order, len(cards))):
+            self.timed("plus_click", card.plus_click, None)
+            self.pause()
+        frontbox.user_name.value = f"cliente {self.rng.randint(1, 10_000)}"
+        frontbox.user_age.value = str(self.rng.randint(12, 60))
+        frontbox.payment_method.value = self.rng.choice(("Crédito", "Débito", "Dinheiro", "Pix"))
+        # send_order ignores an empty cart; only orders it accepted count
+        placed = bool(frontbox.cart)
+        if self.timed("send_order", frontbox.send_order, None) and placed:
+            self.orders += 1
+
+    def pause(self):
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+    def run(self, deadline: float):
+        self.login()
+        while time.monotonic() < deadline:
+            self.checkout()
+            if self.dashboard_every and self.orders % self.dashboard_every == 0:
+                self.timed("open_dashboard", self.switch_tab, DASHBOARD_TAB)
+                self.pause()
+                self.timed("open_frontbox", self.switch_tab, FRONTBOX_TAB)
+            self.pause()
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_load(sessions: int, duration: float, args) -> dict:
+    catalog.invalidate()
+    rss_before = app_main.resident_memory_mb()
+    cpu_before = cpu_seconds()
+    started = time.monotonic()
+    deadline = started + duration
+    simulated = [Session(random.Random(args.seed + number), args.items, args.dashboard_every, args.think_time)
+                 for number in range(sessions)]
+    threads = [threading.Thread(target=session.run, args=(deadline,), name=f"session-{number}")
+               for number, session in enumerate(simulated)]
+    peak = [rss_before]
+
+    def sample_memory():
+        while any(thread.is_alive() for thread in threads):
+            peak[0] = max(peak[0], app_main.resident_memory_mb())
+            time.sleep(0.2)
+
+    for thread in threads:
+        thread.start()
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    # Let the flusher drain what the sessions queued
+    flusher = orders.get_flusher()
+    drain_deadline = time.monotonic() + 30
+    while flusher.journal.counts().get("pending") and time.monotonic() < drain_deadline:
+        time.sleep(0.1)
+    sampler.join()
+    cpu = cpu_seconds() - cpu_before
+
+    timings = {}
+    for session in simulated:
+        for action, values in session.timings.items():
+            timings.setdefault(action, []).extend(values)
+    placed = sum(session.orders for session in simulated)
+    return {
+        "sessions": sessions,
+        "duration": elapsed,
+        "orders": placed,
+        "orders_per_second": placed / elapsed,
+        "errors": sum(session.errors for session in simulated),
+        "latency": {
+            action: {
+                "count": len(values),
+                "p50": percentile(sorted(values), 0.50),
+                "p95": percentile(sorted(values), 0.95),
+                "p99": percentile(sorted(values), 0.99),
+            }
+            for action, values in sorted(timings.items())
+        },
+        "rss_mb": peak[0],
+        "rss_mb_per_session": (peak[0] - rss_before) / sessions,
+        "cpu_seconds": cpu,
+        "cpu_seconds_per_session": cpu / sessions,
+        "cpu_utilization": cpu / elapsed,
+    }
+
+
+def print_report(result: dict):
+    print(f"\n{result['sessions']} sessions: {result['orders']} orders in {result['duration']:.1f}s "
+          f"({result['orders_per_second']:.1f}/s), {result['errors']} errors, "
+          f"RSS {result['rss_mb']:.0f} MB ({result['rss_mb_per_session']:.1f} MB/session), "
+          f"CPU {result['cpu_utilization']:.0%}")
+    print(f"  {'action':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for action, latency in result["latency"].items():
+        print(f"  {action:<16}{latency['count']:>8}{latency['p50'] * 1000:>10.2f}"
+              f"{latency['p95'] * 1000:>10.2f}{latency['p99'] * 1000:>10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="1,10,25", help="comma-separated session counts to run in turn")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per run")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=10_000, help="orders already in the store")
+    parser.add_argument("--items", type=int, default=3, help="items rung up per order")
+    parser.add_argument("--dashboard-every", type=int, default=10, help="open the dashboard every N orders")
+    parser.add_argument("--think-time", type=float, default=0.05, help="mean pause between actions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load-results.json")
+    args = parser.parse_args(argv)
+
+    database.use_backend(seed_store(MemoryBackend(), args.products, args.history, seed=args.seed))
+    orders.start()
+    results = []
+    for sessions in (int(count) for count in args.sessions.split(",") if count):
+        print(f"running {sessions} sessions for {args.duration:.0f}s", file=sys.stderr)
+        result = run_load(sessions, args.duration, args)
+        print_report(result)
+        results.append(result)
+
+    with open(args.output, "w") as output:
+        json.dump({"args": vars(args), "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
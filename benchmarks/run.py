@@ -0,0 +1,189 @@
+"""Benchmarks for the catalog, checkout and dashboard hot paths.
+
+Runs headless against the in-memory backend filled with synthetic data, so
+no Supabase project is touched. Results are written as JSON; pass an earlier
+results file with ``--compare`` to print the change per benchmark.
+
+    python -m benchmarks.run --products 100,10000 --orders 1000,100000 --output bench.json
+    python -m benchmarks.run --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Before the services read their settings
+os.environ["DATA_BACKEND"] = "memory"
+os.environ.setdefault("ORDER_JOURNAL_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-"), "orders.db"))
+os.environ.setdefault("CATALOG_CACHE_TTL", "3600")
+
+# services.database first: with DATA_BACKEND=memory it imports the backend itself
+from services import database
+from services.catalog import catalog
+from benchmarks.fake_page import make_page
+from benchmarks.synthetic import seed_store
+from services.memory_backend import MemoryBackend
+
+
+def measure(function, repeat: int, setup=None) -> dict:
+    """Run ``function`` ``repeat`` times after one warm-up; ``setup`` runs untimed before each call."""
+    timings = []
+    for run in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if run:
+            timings.append(elapsed)
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "min": timings[0],
+        "median": statistics.median(timings),
+        "p95": timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))],
+        "mean": statistics.fmean(timings),
+    }
+
+
+def use_store(products: int, orders: int):
+    database.use_backend(seed_store(MemoryBackend(), products, orders))
+    catalog.invalidate()
+
+
+def bench_catalog(products: int, repeat: int) -> list:
+    from pages import front
+
+    use_store(products, 0)
+    page = make_page()
+    frontbox = front.FrontBox(page, visible=True)
+    results = []
+
+    def add(name: str, function, setup=None):
+        results.append({"name": name, "products": products, "orders": 0, **measure(function, repeat, setup)})
+
+    add("fetch_data.cold", lambda: front.fetch_data(page), setup=catalog.invalidate)
+    add("fetch_data.cached", lambda: front.fetch_data(page))
+
+    def forget_cards():
+        frontbox.cards = {}
+
+    add("populate_products.cold", frontbox.populate_products, setup=forget_cards)
+    add("populate_products.unchanged", frontbox.populate_products)
+
+    for product in frontbox.data[:50]:
+        frontbox.cart.add(product, 2)
+    add("calculate_total_amount", frontbox.calculate_total_amount)
+
+    catalog.search_index()
+    for label, query in (("common", "camiseta"), ("selective", "oversized cargo 1"), ("prefix", "bo")):
+        def search(query=query):
+            frontbox.search_field.value = query
+            frontbox.visible_ids = None
+            frontbox.search_now()
+        add(f"search_items.{label}", search)
+    add("search_index.build", catalog.search_index, setup=catalog.invalidate)
+
+    frontbox.search_field.value = ""
+    frontbox.search_now()
+
+    def fill_cart():
+        frontbox.user_name.value = "cliente"
+        frontbox.payment_method.value = "Pix"
+        for product in frontbox.data[:3]:
+            frontbox.cart.add(product, 1)
+
+    add("send_order", lambda: frontbox.send_order(None), setup=fill_cart)
+    return results
+
+
+def bench_dashboard(products: int, orders: int, repeat: int) -> list:
+    from pages import dashboard
+
+    use_store(products, orders)
+    results = []
+
+    def add(name: str, function, setup=None):
+        results.append({"name": name, "products": products, "orders": orders, **measure(function, repeat, setup)})
+
+    for mode, charts_class in (("client", dashboard.Charts), ("server", dashboard.ServerCharts)):
+        charts = charts_class()
+        add(f"charts.{mode}.load", charts_class)
+        add(f"charts.{mode}.refresh", charts.refresh)
+        for metric in ("total_sold_today", "orders_total_today", "products_sold_today",
+                       "most_sold_products_per_age", "most_sold_products_data"):
+            setup = getattr(charts, "refresh", None) if mode == "client" else None
+            add(f"charts.{mode}.{metric}", getattr(charts, metric), setup=setup)
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: dict, baseline: dict):
+    previous = {(row["name"], row["products"], row["orders"]): row for row in baseline["results"]}
+    print(f"{'benchmark':<44}{'products':>9}{'orders':>10}{'median ms':>12}{'change':>9}")
+    for row in results["results"]:
+        key = (row["name"], row["products"], row["orders"])
+        change = ""
+        if key in previous and previous[key]["median"]:
+            change = f"{row['median'] / previous[key]['median'] - 1:+.0%}"
+        print(f"{row['name']:<44}{row['products']:>9}{row['orders']:>10}{row['median'] * 1000:>12.3f}{change:>9}")
+
+
+def sizes(text: str) -> list:
+    return [int(size.replace("_", "")) for size in text.split(",") if size]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=sizes, default=[100, 1000, 10_000, 100_000])
+    parser.add_argument("--orders", type=sizes, default=[1000, 100_000],
+                        help="order history sizes for the dashboard (10M needs several GB of RAM)")
+    parser.add_argument("--dashboard-products", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    for products in args.products:
+        print(f"catalog: {products} products", file=sys.stderr)
+        results += bench_catalog(products, args.repeat)
+    for orders in args.orders:
+        print(f"dashboard: {orders} orders", file=sys.stderr)
+        results += bench_dashboard(args.dashboard_products, orders, args.repeat)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(report, json.load(baseline))
+    else:
+        compare(report, {"results": []})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import random
+from datetime import datetime, timedelta, timezone
+from services.memory_backend import MemoryBackend
+
+CATEGORIES = ("camisetas", "calças", "acessórios", "bonés", "moletons", "shorts", "tênis", "bolsas")
+WORDS = ("camiseta", "calça", "jeans", "boné", "moletom", "short", "tênis", "bolsa", "preta", "branca",
+         "azul", "verde", "oversized", "básica", "estampada", "slim", "cargo", "infantil", "feminina", "masculina")
+PAYMENTS = ("Crédito", "Débito", "Dinheiro", "Pix")
+
+
+def make_products(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    products = []
+    for number in range(count):
+        price = round(rng.uniform(9.9, 399.9), 2)
+        products.append({
+            "name": f"{' '.join(rng.sample(WORDS, 3))} {number}",
+            "quantity": rng.randint(0, 200),
+            "price": price,
+            "promotion_price": round(price * 0.8, 2) if rng.random() < 0.2 else 0,
+            "category": rng.choice(CATEGORIES),
+        })
+    return products
+
+
+def seed_store(backend: MemoryBackend, products: int, orders: int, days: int = 30, seed: int = 0) -> MemoryBackend:
+    """Fill ``backend`` with a catalog and ``orders`` one-item orders spread over ``days``.
+
+    About one order in ``days`` falls on the current day, so the "today" KPIs
+    have data to chew on.
+    """
+    rng = random.Random(seed)
+    product_ids = backend.bulk_insert("products", make_products(products, seed))
+    prices = {product_id: backend.products[product_id]["price"] for product_id in product_ids}
+    now = datetime.now(timezone.utc)
+
+    batch = 100_000
+    for start in range(0, orders, batch):
+        size = min(batch, orders - start)
+        stamps = [(now - timedelta(seconds=rng.uniform(0, days * 86400))).isoformat() for _ in range(size)]
+        users = backend.bulk_insert("users", [
+            {"name": f"cliente {start + n}", "email": None, "phone": None,
+             "age": rng.choice((None, rng.randint(10, 60))), "created_at": stamps[n]}
+            for n in range(size)])
+        items = [(rng.choice(product_ids), rng.randint(1, 4)) for _ in range(size)]
+        details = backend.bulk_insert("order_details", [
+            {"product_id": product_id, "quantity": quantity, "created_at": stamps[n]}
+            for n, (product_id, quantity) in enumerate(items)])
+        backend.bulk_insert("orders", [
+            {"user_id": users[n], "detail_id": details[n], "payment_type": rng.choice(PAYMENTS),
+             "total": round(prices[product_id] * quantity, 2), "created_at": stamps[n]}
+            for n, (product_id, quantity) in enumerate(items)])
+    return backend
@@ -1,6 +1,33 @@
+from services import startup
 import os
-import flet as ft
-from pages import front, products, settings, dashboard
+import sys
+import threading
+from importlib import import_module
+with startup.timed("import flet"):
+    import flet as ft
+with startup.timed("import pages"):
+    # pages.dashboard (pandas) is imported when the dashboard tab is first built
+    from pages import front, products, settings
+    from services import metrics, orders
+    from services.updates import meter_connection, request_update
+
+# Build the other tabs in the background right after login
+PREFETCH_TABS = os.environ.get("PREFETCH_TABS", "true").lower() in ("1", "true", "yes")
+# Resident memory (MB) above which hidden tabs are dropped; 0 disables eviction
+TAB_MEMORY_LIMIT_MB = int(os.environ.get("TAB_MEMORY_LIMIT_MB", "0"))
+
+ADMIN_TABS = ('frontbox', 'products', 'dashboard', 'settings')
+USER_TABS = ('frontbox', 'settings')
+# Never evicted: the front box holds the cart being rung up
+PINNED_TABS = ('frontbox',)
+
+
+def resident_memory_mb() -> float:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return 0.0
 
 
 class LoginPage(ft.SafeArea):
@@ -79,46 +106,92 @@ class App(ft.SafeArea):
             ]
         )
         self.show_login_page()
-        self.frontbox: front.FrontBox = front.FrontBox(page, visible=True, app=self)
-        self.products: products.Products = products.Products(page, visible=False, frontbox=self.frontbox)
-        self.dashboard: dashboard.Dashboard = dashboard.Dashboard(page, visible=False)
-        self.settings: settings.Settings = settings.Settings(page, visible=False)
+        # Tab pages are built on first navigation and cached for the session
+        self.tabs = {}
+        self.tabs_lock = threading.Lock()
+        self.tab_locks = {name: threading.Lock() for name in ADMIN_TABS}
+        self.tab_builders = {
+            'frontbox': lambda: front.FrontBox(page, visible=False, app=self),
+            'products': lambda: products.Products(page, visible=False, frontbox=self.get_tab('frontbox')),
+            'dashboard': lambda: self.load_module('pages.dashboard').Dashboard(page, visible=False),
+            'settings': lambda: settings.Settings(page, visible=False),
+        }
+        self.tabs_admin: ft.Column = ft.Column()
+        self.tabs_user: ft.Column = ft.Column()
 
         self.main_admin: ft.Column = ft.Column(
-            controls=[
-                ft.Container(
-                    content=ft.Column([
-                        self.frontbox,
-                        self.products,
-                        self.dashboard,
-                        self.settings
-                    ]))
-            ], scroll=ft.ScrollMode.ALWAYS
+            controls=[ft.Container(content=self.tabs_admin)], scroll=ft.ScrollMode.ALWAYS
         )
 
         self.main_user: ft.Column = ft.Column(
-            controls=[
-                ft.Container(
-                    content=ft.Column([
-                        self.frontbox,
-                        self.settings
-                    ]))
-            ], scroll=ft.ScrollMode.ALWAYS
+            controls=[ft.Container(content=self.tabs_user)], scroll=ft.ScrollMode.ALWAYS
         )
 
+    @staticmethod
+    def load_module(name: str):
+        # import_module, not sys.modules: it waits while another session is still importing it
+        if name in sys.modules:
+            return import_module(name)
+        with startup.timed(f"import {name}"):
+            return import_module(name)
+
+    @property
+    def frontbox(self):
+        return self.get_tab('frontbox')
+
+    def get_tab(self, name: str):
+        # One lock per tab: navigation never waits on a different tab's prefetch
+        with self.tab_locks[name]:
+            tab = self.tabs.get(name)
+            if tab is None:
+                tab = self.tab_builders[name]()
+                with self.tabs_lock:
+                    self.tabs[name] = tab
+            return tab
+
+    def show_tab(self, names: tuple, index: int):
+        """Make ``names[index]`` the only visible tab, building it if needed."""
+        column = self.tabs_admin if names is ADMIN_TABS else self.tabs_user
+        selected = self.get_tab(names[index])
+        with self.tabs_lock:
+            if selected not in column.controls:
+                column.controls.append(selected)
+            for tab in column.controls:
+                tab.visible = tab is selected
+            self.evict_tabs()
+        request_update(self.page)
+
+    def evict_tabs(self):
+        """Drop hidden tabs while the process is over TAB_MEMORY_LIMIT_MB."""
+        if not TAB_MEMORY_LIMIT_MB or resident_memory_mb() < TAB_MEMORY_LIMIT_MB:
+            return
+        for name, tab in list(self.tabs.items()):
+            if name in PINNED_TABS or tab.visible:
+                continue
+            del self.tabs[name]
+            # Tabs that put controls on page.overlay take them back
+            if hasattr(tab, "release"):
+                tab.release()
+            for column in (self.tabs_admin, self.tabs_user):
+                if tab in column.controls:
+                    column.controls.remove(tab)
+
+    def prefetch_tabs(self, names: tuple):
+        def build():
+            for name in names:
+                try:
+                    self.get_tab(name)
+                except Exception:
+                    # Navigating to the tab retries and shows the error there
+                    pass
+
+        threading.Thread(target=build, name="tab-prefetch", daemon=True).start()
+
     def change_tab_admin(self, e):
-        my_index = e.control.selected_index
-        self.frontbox.visible = my_index == 0
-        self.products.visible = my_index == 1
-        self.dashboard.visible = my_index == 2
-        self.settings.visible = my_index == 3
-        self.page.update()
+        self.show_tab(ADMIN_TABS, e.control.selected_index)
 
     def change_tab_user(self, e):
-        my_index = e.control.selected_index
-        self.frontbox.visible = my_index == 0
-        self.settings.visible = my_index == 1
-        self.page.update()
+        self.show_tab(USER_TABS, e.control.selected_index)
 
     def show_login_page(self):
         self.content = LoginPage(self)
@@ -129,19 +202,28 @@ class App(ft.SafeArea):
             self.content = self.main_admin
             self.page.navigation_bar = self.navigation_bar_admin
             self.page.navigation_bar.visible = True
+            self.show_tab(ADMIN_TABS, self.navigation_bar_admin.selected_index)
+            if PREFETCH_TABS:
+                self.prefetch_tabs(ADMIN_TABS)
         elif self.is_authenticated_user:
             self.content = self.main_user
             self.page.navigation_bar = self.navigation_bar_user
             self.page.navigation_bar.visible = True
+            self.show_tab(USER_TABS, self.navigation_bar_user.selected_index)
+            if PREFETCH_TABS:
+                self.prefetch_tabs(USER_TABS)
         else:
             self.show_login_page()
-        self.page.update()
+            request_update(self.page)
 
 
 # ==============================================
 # MAIN FUNCTION
 # ==============================================
 def main(page: ft.Page):
+    meter_connection(page.connection)
+    metrics.sessions_active.inc()
+    page.on_close = lambda e: metrics.sessions_active.dec()
     page.theme_mode = ft.ThemeMode.DARK
     theme = ft.Theme()
     page.theme = theme
@@ -149,7 +231,13 @@ def main(page: ft.Page):
     app: App = App(page)
     page.add(app)
     page.update()
+    startup.mark("first page served")
+    startup.report_once()
+
 
+startup.mark("main imported")
 
 if __name__ == "__main__":
-    ft.app(target=main, assets_dir="assets")
+    orders.start()
+    metrics.serve()
+    ft.app(target=main, assets_dir="assets", upload_dir=products.UPLOAD_DIR)
@@ -0,0 +1,28 @@
+import flet as ft
+from services.catalog import catalog
+from services.updates import request_update
+
+
+def display_error_banner(page, error):
+    def close_banner(e):
+        page.banner.open = False
+        request_update(page)
+
+    page.banner = ft.Banner(
+        bgcolor=ft.colors.RED_500,
+        leading=ft.Icon(name=ft.icons.WARNING_AMBER_ROUNDED),
+        content=ft.Text(f"Error occurred: {error}"),
+        actions=[ft.TextButton("Cancel", on_click=close_banner)]
+    )
+    page.banner.open = True
+    request_update(page)
+
+
+def fetch_data(page: ft.Page, force: bool = False) -> tuple:
+    """The shared catalog; on failure shows the error and returns an empty one."""
+    try:
+        return catalog.get(force=force)
+
+    except Exception as a:
+        display_error_banner(page, a)
+        return ()
@@ -1,69 +1,179 @@
+import os
+import threading
+import time
 import flet as ft
 import pandas as pd
-from supabase import create_client
-from dotenv import load_dotenv
 from datetime import datetime
-import pytz
-import os
+from zoneinfo import ZoneInfo
+from services import database, metrics, orders
+from services.catalog import catalog
+from services.updates import request_update
+
+
+DASHBOARD_AGGREGATION = os.environ.get("DASHBOARD_AGGREGATION", "client")
+DASHBOARD_TIMEZONE = 'America/Sao_Paulo'
+DASHBOARD_REFRESH_INTERVAL = float(os.environ.get("DASHBOARD_REFRESH_INTERVAL", "300"))
+DASHBOARD_MIN_REFRESH_INTERVAL = float(os.environ.get("DASHBOARD_MIN_REFRESH_INTERVAL", "10"))
+# Until the first snapshot succeeds, it is retried this often instead of every refresh interval
+DASHBOARD_RETRY_INTERVAL = float(os.environ.get("DASHBOARD_RETRY_INTERVAL", "15"))
+
+DETAILS_PRODUCTS_MERGE = dict(left_on='product_id', right_on='id', how='inner',
+                              suffixes=('_order_details', '_products'))
+ORDERS_DETAILS_MERGE = dict(left_on='detail_id', right_on='id_order_details', how='inner',
+                            suffixes=('_orders', '_details_products'))
+USERS_MERGE = dict(left_on='user_id', right_on='id', how='inner',
+                   suffixes=('_orders_details_products', '_users'))
+
+
+# Compact dtypes; nullable where Supabase may return NULL. Totals stay float64
+# so a day's sum keeps exact cents
+COLUMN_DTYPES = {
+    'orders': {'id': 'int32', 'user_id': 'Int32', 'detail_id': 'Int32', 'total': 'float64'},
+    'order_details': {'id': 'int32', 'product_id': 'Int32', 'quantity': 'int32'},
+    'users': {'id': 'int32', 'age': 'float32'},
+    'products': {'id': 'int32', 'quantity': 'Int32', 'price': 'float32', 'promotion_price': 'float32',
+                 'name': 'category', 'category': 'category'},
+}
 
-load_dotenv()
-supabaseUrl = "https://crswolnvchmpqdjqldop.supabase.co"
-supabaseKey = os.environ.get("SUPABASE_KEY")
-supabase = create_client(supabase_url=supabaseUrl, supabase_key=supabaseKey)
+
+def normalize(frame: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Cast ``frame`` once at load so the KPI methods never convert again.
+
+    ``created_at`` becomes a tz-aware São Paulo timestamp and ``local_date``
+    its local calendar day, the one day boundary every metric uses.
+    """
+    frame = frame.astype(COLUMN_DTYPES[table])
+    if 'created_at' in frame:
+        frame['created_at'] = pd.to_datetime(frame['created_at'], utc=True, format='ISO8601') \
+            .dt.tz_convert(DASHBOARD_TIMEZONE)
+        frame['local_date'] = frame['created_at'].dt.tz_localize(None).dt.normalize()
+    return frame
+
+
+def today() -> pd.Timestamp:
+    return pd.Timestamp(datetime.now(ZoneInfo(DASHBOARD_TIMEZONE)).date())
+
+
+def append(frame: pd.DataFrame, *new: pd.DataFrame) -> pd.DataFrame:
+    new = [rows for rows in new if not rows.empty]
+    if not new:
+        return frame
+    if frame.empty:
+        return pd.concat(new, ignore_index=True) if len(new) > 1 else new[0].reset_index(drop=True)
+    return pd.concat([frame, *new], ignore_index=True)
 
 
 class Charts:
+    """Dashboard data, kept in memory and extended on every refresh.
+
+    Only rows above the last loaded id of each table are downloaded, and the
+    merged frames are extended with the joins of the new rows instead of
+    being rebuilt from the full history.
+    """
+
     def __init__(self):
-        orders_data, order_details_data, users_data, products_data = self.fetch_data()
-        self.orders_df = pd.DataFrame(orders_data)
-        self.order_details_df = pd.DataFrame(order_details_data)
-        self.users_df = pd.DataFrame(users_data)
-        self.products_df = pd.DataFrame(products_data)
-
-        self.details_with_products = pd.merge(self.order_details_df, self.products_df, left_on='product_id', right_on='id',
-                                              how='inner', suffixes=('_order_details', '_products'))
-        self.orders_with_details = pd.merge(self.orders_df, self.details_with_products, left_on='detail_id', right_on='id_order_details',
-                                            how='inner', suffixes=('_orders', '_details_products'))
-        self.final_merged_df = pd.merge(self.orders_with_details, self.users_df, left_on='user_id', right_on='id',
-                                        how='inner', suffixes=('_orders_details_products', '_users'))
+        self.watermarks = {}
+        self.products = None
+        self.orders_df = self.load_frame([], 'orders')
+        self.order_details_df = self.load_frame([], 'order_details')
+        self.users_df = self.load_frame([], 'users')
+        self.products_df = self.load_frame([], 'products')
+        self._today = None
+        self.refresh()
 
     @staticmethod
-    def fetch_data():
-        orders_data = supabase.table('orders').select('*').execute().data
-        order_details_data = supabase.table('order_details').select('*').execute().data
-        users_data = supabase.table('users').select('id, age').execute().data
-        products_data = supabase.table('products').select('*').execute().data
+    def load_frame(rows: list, table: str) -> pd.DataFrame:
+        columns = database.PRODUCT_COLUMNS if table == 'products' else database.ANALYTICS_COLUMNS[table]
+        return normalize(pd.DataFrame(rows, columns=columns), table)
+
+    def fetch_data(self):
+        return database.fetch_analytics(self.watermarks)
+
+    @metrics.render_seconds.timed(view="dashboard_charts")
+    def refresh(self):
+        # Watermarks move only once the new rows are merged in: a refresh that
+        # fails on the way fetches the same rows again next time
+        data = self.fetch_data()
+        products = catalog.get()
+        new_orders = self.load_frame(data['orders'], 'orders')
+        new_details = self.load_frame(data['order_details'], 'order_details')
+        new_users = self.load_frame(data['users'], 'users')
+        self._today = None
+
+        if products != self.products:
+            # A renamed or deleted product changes old rows too, so start over
+            products_df = self.load_frame(products, 'products')
+            orders_df = append(self.orders_df, new_orders)
+            order_details_df = append(self.order_details_df, new_details)
+            users_df = append(self.users_df, new_users)
+            details_with_products = pd.merge(order_details_df, products_df, **DETAILS_PRODUCTS_MERGE)
+            orders_with_details = pd.merge(orders_df, details_with_products, **ORDERS_DETAILS_MERGE)
+            final_merged_df = pd.merge(orders_with_details, users_df, **USERS_MERGE)
+
+            self.products = products
+            self.products_df = products_df
+            self.orders_df = orders_df
+            self.order_details_df = order_details_df
+            self.users_df = users_df
+            self.details_with_products = details_with_products
+            self.orders_with_details = orders_with_details
+            self.final_merged_df = final_merged_df
+            self.advance(data)
+            return
+
+        # (A + dA) join (B + dB) = A join B + dA join (B + dB) + A join dB; rows of a
+        # single order can arrive in different refreshes, so both deltas are needed
+        new_details_with_products = pd.merge(new_details, self.products_df, **DETAILS_PRODUCTS_MERGE)
+        all_details_with_products = append(self.details_with_products, new_details_with_products)
+        old_orders = self.orders_df[self.orders_df['detail_id'].isin(new_details_with_products['id_order_details'])]
+        new_orders_with_details = append(
+            pd.merge(new_orders, all_details_with_products, **ORDERS_DETAILS_MERGE),
+            pd.merge(old_orders, new_details_with_products, **ORDERS_DETAILS_MERGE)
+        )
+        all_users = append(self.users_df, new_users)
+        old_orders_with_details = self.orders_with_details[self.orders_with_details['user_id'].isin(new_users['id'])]
+        new_final = append(
+            pd.merge(new_orders_with_details, all_users, **USERS_MERGE),
+            pd.merge(old_orders_with_details, new_users, **USERS_MERGE)
+        )
 
-        return orders_data, order_details_data, users_data, products_data
+        self.orders_df = append(self.orders_df, new_orders)
+        self.order_details_df = append(self.order_details_df, new_details)
+        self.users_df = all_users
+        self.details_with_products = all_details_with_products
+        self.orders_with_details = append(self.orders_with_details, new_orders_with_details)
+        self.final_merged_df = append(self.final_merged_df, new_final)
+        self.advance(data)
+
+    def advance(self, data: dict):
+        for table, rows in data.items():
+            if rows:
+                self.watermarks[table] = max(row['id'] for row in rows)
+
+    def today_metrics(self) -> dict:
+        """All of today's KPIs from one vectorized pass over each frame."""
+        day = today()
+        if self._today is None or self._today[0] != day:
+            orders_today = (self.orders_df['local_date'] == day).to_numpy()
+            details_today = (self.order_details_df['local_date'] == day).to_numpy()
+            self._today = (day, {
+                'total_sold_today': round(float(self.orders_df['total'].to_numpy()[orders_today].sum()), 2),
+                'orders_total_today': int(orders_today.sum()),
+                'products_sold_today': int(self.order_details_df['quantity'].to_numpy()[details_today].sum()),
+            })
+        return self._today[1]
 
     def total_sold_today(self):
-        brazil_tz = pytz.timezone('America/Sao_Paulo')
-        self.orders_df['created_at'] = pd.to_datetime(self.orders_df['created_at'], errors='coerce').dt.tz_convert(brazil_tz)
-        self.orders_df['total'] = self.orders_df['total'].astype(float)
-        today = datetime.now().date()
-        data = self.orders_df.loc[self.orders_df['created_at'].dt.date == today]
-        total_sum = data['total'].sum()
-        total_sum = round(total_sum, 2)
-        return total_sum
+        return self.today_metrics()['total_sold_today']
 
     def orders_total_today(self):
-        self.orders_df['created_at'] = pd.to_datetime(self.orders_df['created_at'])
-        today = datetime.now().date()
-        data = self.orders_df.loc[self.orders_df['created_at'].dt.date == today]
-        data = data.shape[0]
-        return data
+        return self.today_metrics()['orders_total_today']
 
     def products_sold_today(self):
-        self.order_details_df['created_at'] = pd.to_datetime(self.order_details_df['created_at'])
-        self.order_details_df['quantity'] = self.order_details_df['quantity'].astype(int)
-        today = datetime.now().date()
-
-        data = self.orders_df.loc[self.order_details_df['created_at'].dt.date == today]
-        total_sum = data['quantity'].sum()
-        return total_sum
+        return self.today_metrics()['products_sold_today']
 
     def most_sold_products_per_age(self):
-        data = self.final_merged_df.groupby(['age', 'name'])['quantity_order_details'].sum().reset_index()
+        data = self.final_merged_df.groupby(['age', 'name'], observed=True)['quantity_order_details'].sum().reset_index()
         data = data.sort_values(['age', 'quantity_order_details'], ascending=[True, False])
 
         max_indices = data.groupby('age')['quantity_order_details'].idxmax()
@@ -78,41 +188,185 @@ class Charts:
         result_df = result_df.groupby('age_group', observed=True).first().reset_index()
         return result_df
 
+    def most_sold_products_data(self):
+        data = self.details_with_products.groupby('name', observed=True)['quantity_order_details'].sum().reset_index()
+        return data.sort_values('quantity_order_details', ascending=False).head(8)
+
     def most_sold_products(self):
-        data = self.details_with_products.groupby('name')['quantity_order_details'].sum().reset_index()
-        data = data.sort_values('quantity_order_details', ascending=False).head(8)
-        bar_groups = [
-            ft.BarChartGroup(
-                x=i,
-                bar_rods=[
-                    ft.BarChartRod(
-                        from_y=0,
-                        to_y=quantity,
-                        width=40,
-                        color=ft.colors.BLUE,
-                        border_radius=0,
-                    ),
-                ],
-            ) for i, (name, quantity) in enumerate(zip(data['name'], data['quantity_order_details']))
-        ]
+        return most_sold_products_chart(self.most_sold_products_data())
 
-        chart = ft.BarChart(
-            bar_groups=bar_groups,
-            border=ft.border.all(1, ft.colors.GREY_400),
-            left_axis=ft.ChartAxis(
-                labels_size=40, title_size=40, labels_interval=1
-            ),
-            bottom_axis=ft.ChartAxis(
-                labels=[
-                    ft.ChartAxisLabel(value=i, label=ft.Container(ft.Text(name), padding=10))
-                    for i, name in enumerate(data['name'])
-                ],
-                labels_size=40,
-            ),
-            max_y=data['quantity_order_details'].max() + 2,
-            expand=True,
-        )
-        return chart
+
+class ServerCharts:
+    """Same figures as ``Charts``, aggregated by Postgres.
+
+    One ``dashboard_summary`` call returns the KPIs and top-N tables, so the
+    payload stays the same size however much order history there is.
+    Enabled with ``DASHBOARD_AGGREGATION=server``.
+    """
+
+    def __init__(self):
+        self.refresh()
+
+    @metrics.render_seconds.timed(view="dashboard_summary")
+    def refresh(self):
+        self.summary = database.fetch_dashboard_summary(DASHBOARD_TIMEZONE, top=8)
+
+    def total_sold_today(self):
+        return round(float(self.summary['total_sold_today']), 2)
+
+    def orders_total_today(self):
+        return self.summary['orders_total_today']
+
+    def products_sold_today(self):
+        return self.summary['products_sold_today']
+
+    def most_sold_products_per_age(self):
+        return pd.DataFrame(self.summary['most_sold_products_per_age'],
+                            columns=['age_group', 'name', 'quantity_order_details'])
+
+    def most_sold_products_data(self):
+        return pd.DataFrame(self.summary['most_sold_products'], columns=['name', 'quantity_order_details'])
+
+    def most_sold_products(self):
+        return most_sold_products_chart(self.most_sold_products_data())
+
+
+class DashboardSnapshot:
+    """Figures computed once by ``SnapshotScheduler`` and read by every admin session."""
+
+    def __init__(self, charts):
+        self.created_at = time.time()
+        self._total_sold_today = charts.total_sold_today()
+        self._orders_total_today = charts.orders_total_today()
+        self._products_sold_today = charts.products_sold_today()
+        self._most_sold_products = charts.most_sold_products_data()
+        self._most_sold_products_per_age = charts.most_sold_products_per_age()
+
+    def total_sold_today(self):
+        return self._total_sold_today
+
+    def orders_total_today(self):
+        return self._orders_total_today
+
+    def products_sold_today(self):
+        return self._products_sold_today
+
+    def most_sold_products_per_age(self):
+        return self._most_sold_products_per_age
+
+    def most_sold_products(self):
+        return most_sold_products_chart(self._most_sold_products)
+
+
+class SnapshotScheduler:
+    """Recomputes the process-wide dashboard snapshot in the background.
+
+    A new snapshot is built every ``interval`` seconds, or sooner when orders
+    are committed, but never more often than every ``min_interval`` seconds.
+    Sessions only ever read the latest finished snapshot. While there is
+    none yet, failed builds are retried every ``retry_interval`` seconds.
+    """
+
+    def __init__(self, interval: float = DASHBOARD_REFRESH_INTERVAL,
+                 min_interval: float = DASHBOARD_MIN_REFRESH_INTERVAL,
+                 retry_interval: float = DASHBOARD_RETRY_INTERVAL):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.retry_interval = retry_interval
+        self.snapshot = None
+        self.error = None
+        self._charts = None
+        self._thread = None
+        self._attempts = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._finished = threading.Condition()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dashboard-snapshot", daemon=True)
+                self._thread.start()
+
+    def get(self) -> DashboardSnapshot:
+        """The latest snapshot; without one, waits for a new attempt and raises its error."""
+        self.start()
+        with self._finished:
+            attempts = self._attempts
+            if self.snapshot is None and attempts:
+                # The last attempt failed: try again now rather than at the next retry
+                self._wake.set()
+                self._finished.wait_for(lambda: self._attempts > attempts)
+            else:
+                self._finished.wait_for(lambda: self._attempts)
+            if self.snapshot is None:
+                raise self.error
+            return self.snapshot
+
+    def request_refresh(self):
+        self._wake.set()
+
+    def compute(self) -> DashboardSnapshot:
+        if self._charts is None:
+            self._charts = ServerCharts() if DASHBOARD_AGGREGATION == "server" else Charts()
+        else:
+            self._charts.refresh()
+        return DashboardSnapshot(self._charts)
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                snapshot, error = self.compute(), None
+            except Exception as e:
+                snapshot, error = self.snapshot, e
+            with self._finished:
+                self.snapshot, self.error = snapshot, error
+                self._attempts += 1
+                self._finished.notify_all()
+
+            self._wake.wait(self.interval if self.snapshot is not None else self.retry_interval)
+            time.sleep(max(0.0, self.min_interval - (time.monotonic() - started)))
+            self._wake.clear()
+
+
+snapshots = SnapshotScheduler()
+orders.add_commit_listener(snapshots.request_refresh)
+
+
+def most_sold_products_chart(data: pd.DataFrame) -> ft.BarChart:
+    bar_groups = [
+        ft.BarChartGroup(
+            x=i,
+            bar_rods=[
+                ft.BarChartRod(
+                    from_y=0,
+                    to_y=quantity,
+                    width=40,
+                    color=ft.colors.BLUE,
+                    border_radius=0,
+                ),
+            ],
+        ) for i, (name, quantity) in enumerate(zip(data['name'], data['quantity_order_details']))
+    ]
+
+    chart = ft.BarChart(
+        bar_groups=bar_groups,
+        border=ft.border.all(1, ft.colors.GREY_400),
+        left_axis=ft.ChartAxis(
+            labels_size=40, title_size=40, labels_interval=1
+        ),
+        bottom_axis=ft.ChartAxis(
+            labels=[
+                ft.ChartAxisLabel(value=i, label=ft.Container(ft.Text(name), padding=10))
+                for i, name in enumerate(data['name'])
+            ],
+            labels_size=40,
+        ),
+        max_y=data['quantity_order_details'].max() + 2,
+        expand=True,
+    )
+    return chart
 
 
 toggle_style_sheet: dict = {"icon": ft.icons.REFRESH_ROUNDED, "icon_size": 20}
@@ -122,13 +376,13 @@ class Dashboard(ft.SafeArea):
     def __init__(self, page: ft.Page, visible):
         super().__init__(visible)
         self.page = page
-        self.charts = Charts()
+        self.charts = None
         self.title: ft.Text = ft.Text("Dashboard", size=20, weight=ft.FontWeight.W_800)
         self.toggle: ft.IconButton = ft.IconButton(
             **toggle_style_sheet, on_click=lambda e: self.refresh(e)
         )
 
-        self.all_charts = self.load_data()
+        self.all_charts = self.load_latest()
         self.main: ft.Column = ft.Column([
             ft.Container(content=ft.Column([
                 ft.Row(
@@ -210,15 +464,18 @@ class Dashboard(ft.SafeArea):
 
         return all_charts
 
-    def refresh(self, e):
-        self.toggle.content = ft.ProgressRing(width=16, height=16, stroke_width=2, color=ft.colors.WHITE)
-        self.toggle.icon = None
-        self.page.update()
+    def load_latest(self) -> ft.Column:
+        # A failed snapshot shows its error in place of the charts; the refresh button retries
+        try:
+            self.charts = snapshots.get()
+        except Exception as error:
+            return ft.Column([ft.Text(f"Não foi possível carregar o dashboard: {error}", color=ft.colors.RED_500)])
+        return self.load_data()
 
-        self.charts.fetch_data()
-        new_charts = self.load_data()
+    def refresh(self, e):
+        # Swap in the latest shared snapshot and ask for a fresh one in the background
+        new_charts = self.load_latest()
+        snapshots.request_refresh()
         self.all_charts.controls.clear()
         self.all_charts.controls.extend(new_charts.controls)
-
-        self.toggle.icon = ft.icons.REFRESH_ROUNDED
-        self.page.update()
+        request_update(self.page)
@@ -1,71 +1,31 @@
-import flet as ft
 import os
-from supabase import create_client
-from dotenv import load_dotenv
-
-
-load_dotenv()
-supabaseUrl = "https://crswolnvchmpqdjqldop.supabase.co"
-supabaseKey = os.environ.get("SUPABASE_KEY")
-supabase = create_client(supabase_url=supabaseUrl, supabase_key=supabaseKey)
-
-
-def display_error_banner(page, error):
-    def close_banner(e):
-        page.banner.open = False
-        page.update()
-
-    page.banner = ft.Banner(
-        bgcolor=ft.colors.RED_500,
-        leading=ft.Icon(name=ft.icons.WARNING_AMBER_ROUNDED),
-        content=ft.Text(f"Error occurred: {error}"),
-        actions=[ft.TextButton("Cancel", on_click=close_banner)]
-    )
-    page.banner.open = True
-    page.update()
-
-
-def fetch_data(page: ft.Page) -> list:
-    try:
-        result = supabase.table("products").select('*').order("category").execute()
-        products = result.data
+import uuid
+import flet as ft
+from pages.common import fetch_data
+from services import metrics
+from services.cart import Cart, format_cents
+from services.catalog import Product, catalog, patch
+from services.orders import PendingOrder, discard_order, submit_order
+from services.search import Debouncer, LIVE_SEARCH, matches
+from services.updates import flush_update, request_update
 
-        name_list = [{'id': product['id'], 'name': product['name'], 'quantity': product['quantity'],
-                      'price': product['price'], 'promotion_price': product['promotion_price'],
-                      'category': product['category']} for product in products if product['name']]
-        return name_list
 
-    except Exception as a:
-        display_error_banner(page, a)
-        return []
+category_color_mapping = {
+    'vestuário': ft.colors.BLUE_700,
+}
 
 
 class Products(ft.Container):
-    def __init__(self, frontbox: 'FrontBox', products: dict, quantity: int) -> None:
+    def __init__(self, frontbox: 'FrontBox', products: Product, quantity: int) -> None:
         super().__init__(width=180, height=130, padding=4, border_radius=10, margin=4, bgcolor=ft.colors.GREY_600)
         self.frontbox = frontbox
-        self.products = products
         self.page = self.frontbox.page
 
-        category_color_mapping = {
-            'vestuário': ft.colors.BLUE_700,
-        }
-
-        category = products['category'].lower()
-        self.bgcolor = category_color_mapping.get(category, ft.colors.GREY_600)
-
-        self.product_id_ = products['id']
-        self.product_price_ = products['price']
-        self.product_price_str = self.replace_dot(str(self.product_price_))
-        self.product_price_str = f"R${self.product_price_str}"
-        self.promotion_price_ = str(products['promotion_price'])
-        self.promotion_price_str = self.replace_dot(str(self.promotion_price_))
-        self.promotion_price_str = f"R${self.promotion_price_str}"
-
-        self.product_title: ft.Text = ft.Text(products['name'], size=14, weight=ft.FontWeight.W_600, color=ft.colors.WHITE)
+        self.product_title: ft.Text = ft.Text(size=14, weight=ft.FontWeight.W_600, color=ft.colors.WHITE)
         self.order_counter: ft.TextField = ft.TextField(value=str(quantity), text_align=ft.TextAlign.CENTER,
-                                                        height=20, expand=False, width=50, color=ft.colors.WHITE)
-        self.product_price: ft.Text = ft.Text(self.product_price_str, size=16, color=ft.colors.WHITE)
+                                                        height=20, expand=False, width=50, color=ft.colors.WHITE,
+                                                        on_change=self.counter_change)
+        self.product_price: ft.Text = ft.Text(size=16, color=ft.colors.WHITE)
         self.promotion_price: ft.Text = ft.Text("", size=16, color=ft.colors.WHITE)
         button_row = ft.Row(controls=[
             ft.IconButton(ft.icons.REMOVE, on_click=self.minus_click, icon_color=ft.colors.WHITE),
@@ -73,7 +33,7 @@ class Products(ft.Container):
             ft.IconButton(ft.icons.ADD, on_click=self.plus_click, icon_color=ft.colors.WHITE),
         ], alignment=ft.MainAxisAlignment.CENTER, spacing=2)
 
-        self.if_promotion_price()
+        self.set_product(products)
         self.content: ft.Column = ft.Column(
             alignment=ft.MainAxisAlignment.CENTER,
             controls=[
@@ -84,35 +44,53 @@ class Products(ft.Container):
             ]
         )
 
+    def set_product(self, products: Product):
+        self.products = products
+        category = (products['category'] or "").lower()
+        self.bgcolor = category_color_mapping.get(category, ft.colors.GREY_600)
+
+        self.product_id_ = products['id']
+        self.product_title.value = products['name']
+        self.if_promotion_price()
+
     def minus_click(self, e):
-        self.order_counter.value = str(int(self.order_counter.value) - 1)
-        if int(self.order_counter.value) < 0:
-            self.order_counter.value = 0
+        self.order_counter.value = str(self.frontbox.cart.add(self.products, -1))
         self.frontbox.calculate_total_amount()
-        self.frontbox.page.update()
+        request_update(self.frontbox.page)
 
     def plus_click(self, e):
-        self.order_counter.value = str(int(self.order_counter.value) + 1)
+        self.order_counter.value = str(self.frontbox.cart.add(self.products, 1))
         self.frontbox.calculate_total_amount()
-        self.frontbox.page.update()
+        request_update(self.frontbox.page)
+
+    def counter_change(self, e):
+        try:
+            quantity = int(self.order_counter.value)
+        except ValueError:
+            return
+        self.frontbox.cart.set_quantity(self.products, quantity)
+        self.frontbox.calculate_total_amount()
+        request_update(self.frontbox.page)
 
     def if_promotion_price(self):
-        if float(self.promotion_price_) > 0:
-            self.promotion_price.value = self.promotion_price_str
-            self.product_price = ft.Text(spans=[ft.TextSpan(self.product_price_str, ft.TextStyle(decoration=ft.TextDecoration.LINE_THROUGH))], size=13)
-        self.frontbox.page.update()
-
-    @staticmethod
-    def replace_dot(num):
-        if "." in num:
-            number = num.replace(".", ",")
+        # Labels come preformatted and shared from the catalog records
+        if self.products.on_promotion:
+            self.promotion_price.value = self.products.promotion_label
+            self.product_price.value = None
+            self.product_price.spans = [ft.TextSpan(self.products.price_label, ft.TextStyle(decoration=ft.TextDecoration.LINE_THROUGH))]
+            self.product_price.size = 13
         else:
-            number = num
-        return number
+            self.promotion_price.value = ""
+            self.product_price.value = self.products.price_label
+            self.product_price.spans = []
+            self.product_price.size = 16
 
 
 toggle_style_sheet: dict = {"icon": ft.icons.REFRESH_ROUNDED, "icon_size": 20}
 search_button_style_sheet: dict = {"icon": ft.icons.SEARCH_ROUNDED, "icon_size": 25}
+GRID_PAGE_SIZE = int(os.environ.get("GRID_PAGE_SIZE", "40"))
+GRID_LOAD_AHEAD = 300
+
 search_style_sheet: dict = {"height": 35, "expand": True, "cursor_height": 15, "hint_text": "Pesquisar um produto...",
                             "content_padding": 7, "border_radius": 12}
 
@@ -123,16 +101,28 @@ class FrontBox(ft.SafeArea):
         self.page = page
         self.data = fetch_data(page=self.page)
         self.title: ft.Text = ft.Text("Loja do Nova", size=20, weight=ft.FontWeight.W_800)
+        self.pending_orders = []
+        self.pending_badge: ft.Text = ft.Text("", size=12, color=ft.colors.AMBER_400)
         self.app = app
         # self.menubar = self.app.menubar
         self.toggle: ft.IconButton = ft.IconButton(
             **toggle_style_sheet, on_click=lambda e: self.refresh(e)
         )
-        self.search_field: ft.TextField = ft.TextField(**search_style_sheet, on_submit=lambda e: self.search_items())
+        self.live_search = Debouncer(self.search_items)
+        self.search_field: ft.TextField = ft.TextField(**search_style_sheet, on_submit=lambda e: self.search_now(),
+                                                       on_change=self.live_search if LIVE_SEARCH else None)
         self.search_button: ft.IconButton = ft.IconButton(**search_button_style_sheet,
-                                                          on_click=lambda e: self.search_items())
-        self.list_products: ft.ListView = ft.ListView(expand=True, spacing=5)
-        self.quantities = {}
+                                                          on_click=lambda e: self.search_now())
+        self.list_products: ft.GridView = ft.GridView(expand=True, runs_count=2, child_aspect_ratio=180 / 130,
+                                                      spacing=10, run_spacing=5,
+                                                      on_scroll=self.grid_scroll, on_scroll_interval=100)
+        self.load_more_button: ft.TextButton = ft.TextButton(text="Mostrar mais", visible=False,
+                                                             on_click=lambda e: self.load_more())
+        self.cards = {}
+        self.visible_ids = None
+        self.limit = GRID_PAGE_SIZE
+        self.cart = Cart()
+        self.order_key = uuid.uuid4()
         self.reset_order_button: ft.TextButton = ft.TextButton(
             text="Reset",
             on_click=self.reset_order
@@ -174,7 +164,7 @@ class FrontBox(ft.SafeArea):
                 ft.Row(
                     alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                     controls=[self.title,
-                              ft.Row([self.toggle], alignment=ft.MainAxisAlignment.END)
+                              ft.Row([self.pending_badge, self.toggle], alignment=ft.MainAxisAlignment.END)
                               ]
                 ),
                 ft.Divider(height=5),
@@ -184,115 +174,177 @@ class FrontBox(ft.SafeArea):
                 ft.Divider(height=2, color=ft.colors.TRANSPARENT),
                 ft.Divider(height=5),
                 ft.Row(controls=[self.search_field, self.search_button], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                ft.Container(content=self.list_products, expand=True)
+                ft.Container(content=self.list_products, expand=True),
+                ft.Row(controls=[self.load_more_button], alignment=ft.MainAxisAlignment.CENTER)
             ], scroll=ft.ScrollMode.ALWAYS
         )
         self.populate_products()
+        catalog.subscribe(self.catalog_changed)
+
+    def catalog_changed(self, product_id, record):
+        """Patch one product saved or deleted in any session, without refetching."""
+        if product_id is None:
+            self.refresh_products()
+            if self.visible_ids is not None:
+                self.search_items()
+            return
+        # The shared catalog already has the change; patch a private copy only if it was dropped
+        shared = catalog.peek()
+        self.data = shared if shared is not None else patch(self.data, product_id, record)
+        if record is None:
+            self.cart.remove(product_id)
+        else:
+            self.cart.reprice(record)
+        if self.visible_ids is not None:
+            query = self.search_field.value or ""
+            if record is not None and matches(record, query):
+                self.visible_ids = self.visible_ids | {product_id}
+            else:
+                self.visible_ids = self.visible_ids - {product_id}
+        self.populate_products()
 
-    def refresh_products(self):
-        self.data = fetch_data(self.page)
-        self.list_products.controls.clear()
+    def refresh_products(self, force: bool = False):
+        self.data = fetch_data(self.page, force=force)
+        products = {product['id']: product for product in self.data}
+        for item in self.cart.items():
+            if item['product_id'] in products:
+                self.cart.reprice(products[item['product_id']])
+            else:
+                self.cart.remove(item['product_id'])
         self.populate_products()
 
+    def shown_products(self) -> list:
+        if self.visible_ids is None:
+            return self.data
+        return [product for product in self.data if product['id'] in self.visible_ids]
+
+    @metrics.render_seconds.timed(view="frontbox_grid")
     def populate_products(self):
-        products_per_row = 2
-        for i in range(0, len(self.data), products_per_row):
-            row_controls = []
-            for product in self.data[i:i + products_per_row]:
-                if product['id'] not in self.quantities:
-                    self.quantities[product['id']] = 0
-                row_controls.append(Products(self, product, self.quantities[product['id']]))
-
-            self.list_products.controls.append(ft.Row(controls=row_controls, spacing=10))
-
-        self.page.update()
-
-    def search_items(self):
-        query = self.search_field.value.lower()
-        if query:
-            filtered_data = [product for product in self.data if query in product["name"].lower()]
-            self.data = filtered_data
+        # Only the first ``limit`` matching products get a card; the rest are
+        # built as the grid scrolls. Cards are keyed by product id and reused,
+        # so only new, removed, moved or changed products produce websocket traffic
+        products = self.shown_products()
+        cards = {}
+        controls = []
+        for product in products[:self.limit]:
+            card = self.cards.get(product['id'])
+            if card is None:
+                card = Products(self, product, self.cart.quantity(product['id']))
+            elif card.products != product:
+                card.set_product(product)
+            cards[product['id']] = card
+            controls.append(card)
+
+        self.cards = cards
+        self.list_products.controls = controls
+        self.load_more_button.visible = len(products) > self.limit
+        self.calculate_total_amount()
+        request_update(self.page)
+
+    def load_more(self):
+        if not self.load_more_button.visible:
+            return
+        self.limit += GRID_PAGE_SIZE
+        self.populate_products()
+
+    def grid_scroll(self, e: ft.OnScrollEvent):
+        if e.max_scroll_extent - e.pixels < GRID_LOAD_AHEAD:
+            self.load_more()
+
+    def search_now(self):
+        self.search_items(self.live_search.cancel())
+
+    def search_items(self, generation: int = None):
+        def stale():
+            return generation is not None and not self.live_search.is_current(generation)
+
+        query = self.search_field.value
+        if query and query.strip():
+            results = catalog.search_index().search(query, cancelled=stale, rank=False)
+            if results is None:
+                return
+            visible_ids = {product['id'] for product in results}
         else:
-            self.data = fetch_data(self.page)
+            visible_ids = None
 
-        self.list_products.controls.clear()
+        # Newer keystrokes arrived while filtering; their own search will update the grid
+        if stale() or visible_ids == self.visible_ids:
+            return
+        self.visible_ids = visible_ids
+        self.limit = GRID_PAGE_SIZE
         self.populate_products()
 
+    @metrics.render_seconds.timed(view="cart_total")
     def calculate_total_amount(self):
-        def replace_dot(num):
-            if "." in num:
-                number = num.replace(".", ",")
-            else:
-                number = num
-            return number
-
-        total_amount = 0
-        for row in self.list_products.controls:
-            for product in row.controls:
-                if isinstance(product, Products):
-                    if float(product.promotion_price_) > 0:
-                        product_price = float(product.promotion_price_)
-                        quantity_ordered = int(product.order_counter.value)
-                        total_amount += product_price * quantity_ordered
-                        self.quantities[product.product_id_] = quantity_ordered
-                    else:
-                        product_price = float(product.product_price_)
-                        quantity_ordered = int(product.order_counter.value)
-                        total_amount += product_price * quantity_ordered
-                        self.quantities[product.product_id_] = quantity_ordered
-
-        total_amount_str = f"R${total_amount:.2f}"
-        total_amount_str = replace_dot(total_amount_str)
-        self.total_amount.value = total_amount_str
+        self.total_amount.value = format_cents(self.cart.total_cents)
 
     def send_order(self, e):
-        self.send_order_button.content = ft.ProgressRing(width=16, height=16, stroke_width=2, color=ft.colors.WHITE)
-        self.send_order_button.icon = None
-        self.page.update()
-        try:
-            user_data = {
-                "name": self.user_name.value,
-                "email": self.user_email.value if self.user_email.value else None,
-                "phone": self.user_phone.value if self.user_phone.value else None,
-                "age": self.user_age.value if self.user_age.value else None
-            }
-            user = supabase.table('users').insert(user_data).execute()
-            user_id = user.data[0]['id']
-
-            order_detail_data = []
-            for row in self.list_products.controls:
-                for product in row.controls:
-                    if isinstance(product, Products):
-                        if int(product.order_counter.value) > 0:
-                            detail_data = {
-                                "product_id": product.product_id_,
-                                "quantity": int(product.order_counter.value)
-                            }
-                            order_detail_data.append(detail_data)
-
-            detail = supabase.table('order_details').insert(order_detail_data).execute()
-            detail_id = detail.data[0]['id']
-
-            def extract_and_convert_to_float(input_string):
-                cleaned_string = ''.join(char if char.isdigit() or char in {',', '.'} else ' ' for char in input_string)
-
-                cleaned_string = cleaned_string.replace(',', '.')
-
-                return float(cleaned_string)
-
-            order = supabase.table('orders').insert({
-                "user_id": user_id,
-                "detail_id": detail_id,
-                "payment_type": self.payment_method.value,
-                "total": extract_and_convert_to_float(self.total_amount.value)
-            }).execute()
-
-            if not order.data:
-                raise Exception
-
-            self.refresh_order_summary()
-        except Exception as a:
-            display_error_banner(self.page, str(a))
+        if not self.cart:
+            return
+
+        user_data = {
+            "name": self.user_name.value,
+            "email": self.user_email.value if self.user_email.value else None,
+            "phone": self.user_phone.value if self.user_phone.value else None,
+            "age": self.user_age.value if self.user_age.value else None
+        }
+        pending = PendingOrder(user_data, self.cart.items(), self.payment_method.value, self.cart.total(),
+                               self.order_key)
+        self.pending_orders.append(pending)
+        submit_order(pending, on_done=self.order_done)
+
+        # The order commits in the background, the cashier can start the next customer
+        self.update_pending_badge()
+        self.refresh_order_summary()
+
+    def order_done(self, pending: PendingOrder):
+        if pending.status == "committed":
+            self.pending_orders.remove(pending)
+            self.page.snack_bar = ft.SnackBar(ft.Text(f"Pedido #{pending.order_id} registrado"),
+                                              bgcolor=ft.colors.GREEN_600)
+            self.page.snack_bar.open = True
+        elif pending.status == "failed":
+            self.display_order_error(pending)
+        self.update_pending_badge()
+        request_update(self.page)
+
+    def display_order_error(self, pending: PendingOrder):
+        def retry(e):
+            self.page.banner.open = False
+            submit_order(pending, on_done=self.order_done)
+            self.update_pending_badge()
+            request_update(self.page)
+
+        def discard(e):
+            self.page.banner.open = False
+            discard_order(pending)
+            self.pending_orders.remove(pending)
+            self.update_pending_badge()
+            request_update(self.page)
+
+        customer = pending.customer["name"] or "cliente"
+        self.page.banner = ft.Banner(
+            bgcolor=ft.colors.RED_500,
+            leading=ft.Icon(name=ft.icons.WARNING_AMBER_ROUNDED),
+            content=ft.Text(f"Pedido de {customer} não registrado: {pending.error}"),
+            actions=[ft.TextButton("Tentar novamente", on_click=retry),
+                     ft.TextButton("Cancel", on_click=discard)]
+        )
+        self.page.banner.open = True
+
+    def update_pending_badge(self):
+        statuses = [pending.status for pending in self.pending_orders]
+        waiting = statuses.count("pending")
+        offline = statuses.count("retrying")
+        failed = statuses.count("failed")
+        status = []
+        if waiting:
+            status.append(f"{waiting} enviando")
+        if offline:
+            status.append(f"{offline} na fila")
+        if failed:
+            status.append(f"{failed} com erro")
+        self.pending_badge.value = " · ".join(status)
 
     def reset_order(self, e):
         self.refresh_order_summary()
@@ -306,17 +358,22 @@ class FrontBox(ft.SafeArea):
         self.user_phone.value = ""
         self.total_amount.value = "R$0,00"
         self.payment_method.value = None
-        self.quantities = {}
 
-        self.list_products.controls.clear()
-        self.populate_products()
+        for item in self.cart.items():
+            card = self.cards.get(item['product_id'])
+            if card is not None:
+                card.order_counter.value = "0"
+        self.cart.clear()
+        self.order_key = uuid.uuid4()
+        request_update(self.page)
 
     def refresh(self, e):
         self.toggle.content = ft.ProgressRing(width=16, height=16, stroke_width=2, color=ft.colors.WHITE)
         self.toggle.icon = None
-        self.page.update()
+        flush_update(self.page)
 
-        self.refresh_products()
+        self.refresh_products(force=True)
 
+        self.toggle.content = None
         self.toggle.icon = ft.icons.REFRESH_ROUNDED
-        self.page.update()
+        request_update(self.page)
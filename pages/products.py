@@ -1,44 +1,27 @@
-import flet as ft
+import itertools
 import os
-from supabase import create_client
-from dotenv import load_dotenv
-
-load_dotenv()
-
-supabaseUrl = "https://crswolnvchmpqdjqldop.supabase.co"
-supabaseKey = os.environ.get("SUPABASE_KEY")
-supabase = create_client(supabase_url=supabaseUrl, supabase_key=supabaseKey)
-
-
-def display_error_banner(page, error):
-    def close_banner(e):
-        page.banner.open = False
-        page.update()
-
-    page.banner = ft.Banner(
-        bgcolor=ft.colors.RED_500,
-        leading=ft.Icon(name=ft.icons.WARNING_AMBER_ROUNDED),
-        content=ft.Text(f"Error occurred: {error}"),
-        actions=[ft.TextButton("Cancel", on_click=close_banner)]
-    )
-    page.banner.open = True
-    page.update()
-
+import shutil
+import threading
+import uuid
+import flet as ft
+from pages.common import display_error_banner, fetch_data
+from services import catalog_io, database, metrics
+from services.catalog import catalog, patch, to_record
+from services.search import matches
+from services.updates import flush_update, request_update
 
-def fetch_data(page: ft.Page) -> list:
-    try:
-        result = supabase.table("products").select('*').execute()
-        products = result.data
 
-        name_list = [{'id': product['id'], 'name': product['name'], 'quantity': product['quantity'],
-                      'price': product['price'], 'promotion_price': product['promotion_price'],
-                      'category': product['category']} for product in products if product['name']]
-        return name_list
+# Uploaded spreadsheets land here (ft.app upload_dir); web exports are served from assets
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
+EXPORT_DIR = os.path.join("assets", "exports")
+# Seconds a web export stays downloadable before its file is deleted
+EXPORT_TTL = float(os.environ.get("EXPORT_TTL", "300"))
 
-    except Exception as a:
-        display_error_banner(page, a)
-        return []
+# Negative ids never collide with Supabase's
+placeholder_ids = itertools.count(-1, -1)
 
+# Panels built up front; "Mostrar mais" adds this many more
+PRODUCTS_PAGE_SIZE = int(os.environ.get("PRODUCTS_PAGE_SIZE", "50"))
 
 toggle_style_sheet: dict = {"icon": ft.icons.ADD_ROUNDED, "icon_size": 30, "icon_color": ft.colors.GREEN_500}
 search_button_style_sheet: dict = {"icon": ft.icons.SEARCH_ROUNDED, "icon_size": 25}
@@ -56,14 +39,44 @@ class Products(ft.SafeArea):
                                                           on_click=lambda e: self.search_items())
         self.data = fetch_data(page=self.page)
         self.text_fields = {}
-        self.save_product_button = None
-        self.delete_product_button = None
-        self.expansion_panel_list = ft.ExpansionPanelList(expand=True)
+        self.panels = {}
+        self.query = ""
+        self.limit = PRODUCTS_PAGE_SIZE
+        # Search results being listed; None lists the whole catalog
+        self.results = None
+        # Panel bodies exist only while expanded; keyed by product id
+        self.buttons = {}
+        self.expansion_panel_list = ft.ExpansionPanelList(expand=True, on_change=self.panel_changed)
+        self.load_more_button: ft.TextButton = ft.TextButton(text="Mostrar mais", visible=False,
+                                                             on_click=lambda e: self.load_more())
         self.add_product: ft.IconButton = ft.IconButton(
             **toggle_style_sheet,
             on_click=self.open_dlg
         )
 
+        # Bulk import / export
+        self.import_picker = ft.FilePicker(on_result=self.import_picked, on_upload=self.import_uploaded)
+        self.export_picker = ft.FilePicker(on_result=self.export_picked)
+        self.page.overlay.extend([self.import_picker, self.export_picker])
+        self.import_button: ft.IconButton = ft.IconButton(
+            icon=ft.icons.UPLOAD_FILE_ROUNDED, tooltip="Importar planilha",
+            on_click=lambda e: self.import_picker.pick_files(allowed_extensions=["csv", "xlsx"])
+        )
+        self.export_button: ft.IconButton = ft.IconButton(
+            icon=ft.icons.DOWNLOAD_ROUNDED, tooltip="Exportar produtos",
+            on_click=self.export_products
+        )
+        self.import_status: ft.Text = ft.Text()
+        self.import_errors: ft.Column = ft.Column(scroll=ft.ScrollMode.AUTO, height=200)
+        self.import_progress: ft.ProgressBar = ft.ProgressBar()
+        self.import_dlg: ft.AlertDialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Importar Produtos"),
+            content=ft.Column([self.import_progress, self.import_status, self.import_errors], tight=True),
+            actions=[ft.TextButton("Fechar", on_click=self.close_import_dlg, disabled=True)],
+            actions_alignment=ft.MainAxisAlignment.END
+        )
+
         # Dialog Content
         self.input_name: ft.TextField = ft.TextField(label="Nome do Produto", expand=True, border_radius=12)
         self.input_quantity: ft.TextField = ft.TextField(label="Quantidade", expand=True, border_radius=12)
@@ -89,67 +102,175 @@ class Products(ft.SafeArea):
             controls=[
                 ft.Row(controls=[
                     ft.Text("Lista de Produtos", size=20, weight=ft.FontWeight.W_800),
-                    self.add_product,
+                    ft.Row([self.import_button, self.export_button, self.add_product], spacing=0),
                 ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                 ft.Divider(height=4),
                 ft.Divider(height=10, color="transparent"),
                 ft.Row(controls=[self.search_field, self.search_button], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                 self.expansion_panel_list,
+                ft.Row(controls=[self.load_more_button], alignment=ft.MainAxisAlignment.CENTER),
             ], scroll=ft.ScrollMode.ALWAYS
         )
 
         self.content = self.main
         self.populate_products()
-
-    def populate_products(self):
+        catalog.subscribe(self.catalog_changed)
+
+    def release(self):
+        """Take the file pickers off the page when the tab is evicted."""
+        for picker in (self.import_picker, self.export_picker):
+            if picker in self.page.overlay:
+                self.page.overlay.remove(picker)
+
+    @metrics.render_seconds.timed(view="products_list")
+    def populate_products(self, products: list = None):
+        # Only the first ``limit`` products get a panel; every panel is a few
+        # KB of controls per session, so large catalogs are built on demand
+        self.results = products
         self.expansion_panel_list.controls.clear()
-        for product in self.data:
-            name_field = ft.TextField(value=str(product['name']), label="Nome")
-            quantity_field = ft.TextField(value=str(product['quantity']), label="Quantidade")
-            price_field = ft.TextField(value=str(product['price']), label="Preço")
-            promotion_price_field = ft.TextField(value=str(product['promotion_price']), label="Preço Promoção")
-            category_field = ft.TextField(value=str(product['category']), label="Categoria")
-            self.text_fields[product['id']] = {
-                'name': name_field,
-                'quantity': quantity_field,
-                'price': price_field,
-                'promotion_price': promotion_price_field,
-                "category": category_field
-            }
+        self.panels = {}
+        self.text_fields = {}
+        self.buttons = {}
+        self.add_panels(self.limit)
+        request_update(self.page)
+
+    def add_panels(self, count: int):
+        products = self.data if self.results is None else self.results
+        panels = self.expansion_panel_list.controls
+        for product in products[len(panels):len(panels) + count]:
+            panels.append(self.build_panel(product))
+        self.load_more_button.visible = len(products) > len(panels)
+
+    def load_more(self):
+        self.limit += PRODUCTS_PAGE_SIZE
+        self.add_panels(PRODUCTS_PAGE_SIZE)
+        request_update(self.page)
+
+    def build_panel(self, product: dict) -> ft.ExpansionPanel:
+        # Collapsed panels carry only their header; the body is built on expand
+        exp = ft.ExpansionPanel(
+            header=ft.ListTile(title=ft.Text(product['name'])), can_tap_header=True, expand=True,
+            content=ft.Container(), data=product
+        )
+        self.panels[product['id']] = exp
+        return exp
+
+    def build_panel_body(self, product: dict) -> ft.Container:
+        name_field = ft.TextField(value=str(product['name']), label="Nome")
+        quantity_field = ft.TextField(value=str(product['quantity']), label="Quantidade")
+        price_field = ft.TextField(value=str(product['price']), label="Preço")
+        promotion_price_field = ft.TextField(value=str(product['promotion_price']), label="Preço Promoção")
+        category_field = ft.TextField(value=str(product['category']), label="Categoria")
+        self.text_fields[product['id']] = {
+            'name': name_field,
+            'quantity': quantity_field,
+            'price': price_field,
+            'promotion_price': promotion_price_field,
+            "category": category_field
+        }
+
+        save_product_button = ft.IconButton(icon=ft.icons.SAVE_ROUNDED, icon_color=ft.colors.BLUE_600,
+                                            on_click=lambda e, prod=product: self.handle_save(prod))
+        delete_product_button = ft.IconButton(icon=ft.icons.DELETE_ROUNDED, icon_color=ft.colors.RED_700,
+                                              on_click=lambda e, prod=product: self.handle_delete(prod))
+        self.buttons[product['id']] = {'save': save_product_button, 'delete': delete_product_button}
+        return ft.Container(
+            content=ft.Column([
+                ft.Divider(height=1, color=ft.colors.TRANSPARENT),
+                name_field,
+                quantity_field,
+                price_field,
+                promotion_price_field,
+                category_field,
+                ft.Row(controls=[
+                    save_product_button,
+                    delete_product_button
+                ], alignment=ft.MainAxisAlignment.END)
+            ])
+        )
 
-            exp = ft.ExpansionPanel(
-                header=ft.ListTile(title=ft.Text(product['name'])), can_tap_header=True, expand=True
-            )
-            self.save_product_button = ft.IconButton(icon=ft.icons.SAVE_ROUNDED, icon_color=ft.colors.BLUE_600,
-                                                     on_click=lambda e, prod=product: self.handle_save(prod))
-            self.delete_product_button = ft.IconButton(icon=ft.icons.DELETE_ROUNDED, icon_color=ft.colors.RED_700,
-                                                       on_click=lambda e, prod=product: self.handle_delete(prod))
-            exp.content = ft.Container(
-                content=ft.Column([
-                    ft.Divider(height=1, color=ft.colors.TRANSPARENT),
-                    name_field,
-                    quantity_field,
-                    price_field,
-                    promotion_price_field,
-                    category_field,
-                    ft.Row(controls=[
-                        self.save_product_button,
-                        self.delete_product_button
-                    ], alignment=ft.MainAxisAlignment.END)
-                ])
-            )
-
-            self.expansion_panel_list.controls.append(exp)
-
-        self.page.update()
+    def release_panel_body(self, product_id):
+        self.text_fields.pop(product_id, None)
+        self.buttons.pop(product_id, None)
+
+    def panel_changed(self, e):
+        panel = self.expansion_panel_list.controls[int(e.data)]
+        product_id = panel.data['id']
+        if product_id < 0:
+            # Still being inserted; there is nothing to edit yet
+            return
+        # Every tap toggles the panel, so our own bookkeeping says which way it went
+        if product_id in self.text_fields:
+            self.release_panel_body(product_id)
+            panel.expanded = False
+            panel.content = ft.Container()
+        else:
+            panel.expanded = True
+            panel.content = self.build_panel_body(panel.data)
+        request_update(self.page)
+
+    def catalog_changed(self, product_id, record, local: bool = False):
+        """Patch the panel of a product saved or deleted in any session.
+
+        ``local`` changes are this admin's unconfirmed writes: they are shown
+        here only, and reach the shared catalog once Supabase confirms them.
+        """
+        if product_id is None:
+            self.data = fetch_data(page=self.page)
+            self.search_items()
+            return
+        # Anything not local is already in the shared catalog
+        shared = catalog.peek()
+        if shared is not None and not local:
+            self.data = shared
+        else:
+            self.data = patch(self.data, product_id, record)
+        panels = self.expansion_panel_list.controls
+        panel = self.panels.get(product_id)
+        shown = record is not None and matches(record, self.query)
+        if self.results is not None:
+            self.results = tuple(product for product in self.results if product['id'] != product_id)
+            if shown:
+                self.results += (record,)
+        if shown and panel is not None and panel in panels:
+            self.set_panel(panel, record)
+        else:
+            if panel is not None:
+                if panel in panels:
+                    panels.remove(panel)
+                del self.panels[product_id]
+                self.release_panel_body(product_id)
+            if shown and self.results is not None:
+                if len(panels) < self.limit:
+                    panels.append(self.build_panel(record))
+            elif shown and record in self.data:
+                # Only inside the built window; later products get their panel from "Mostrar mais"
+                position = self.data.index(record)
+                if position <= len(panels):
+                    panels.insert(position, self.build_panel(record))
+                    if len(panels) > self.limit:
+                        dropped = panels.pop()
+                        del self.panels[dropped.data['id']]
+                        self.release_panel_body(dropped.data['id'])
+            self.load_more_button.visible = len(self.data if self.results is None else self.results) > len(panels)
+        request_update(self.page)
+
+    def set_panel(self, panel: ft.ExpansionPanel, product: dict):
+        panel.data = product
+        panel.header.title.value = product['name']
+        for key, field in self.text_fields.get(product['id'], {}).items():
+            field.value = str(product[key])
 
     def handle_save(self, product):
-        self.save_product_button.content = ft.ProgressRing(width=16, height=16, stroke_width=2, color=ft.colors.WHITE)
-        self.save_product_button.icon = None
-        self.page.update()
-
         product_id = product['id']
         fields = self.text_fields.get(product_id)
+        if fields is None or product_id not in self.buttons:
+            # The panel body was released (collapsed, or replaced by a change from another session)
+            return
+        save_product_button = self.buttons[product_id]['save']
+        save_product_button.content = ft.ProgressRing(width=16, height=16, stroke_width=2, color=ft.colors.WHITE)
+        save_product_button.icon = None
+        flush_update(self.page)
 
         def replace_comma(num):
             if "," in num:
@@ -158,66 +279,70 @@ class Products(ft.SafeArea):
                 number = num
             return number
 
-        price = replace_comma(fields['price'].value)
-        promotion_price = replace_comma(fields['promotion_price'].value)
-
-        if fields:  # Check if the fields exist for the product
+        previous = self.panels[product_id].data if product_id in self.panels else product
+        try:
+            updated_product = {
+                'name': str(fields['name'].value),
+                'quantity': int(fields['quantity'].value),
+                'price': float(replace_comma(fields['price'].value)),
+                'promotion_price': float(replace_comma(fields['promotion_price'].value)),
+                'category': str(fields['category'].value)
+            }
+            # Shown here now; cashiers' cards and carts change once the write is confirmed
+            self.catalog_changed(product_id, to_record({'id': product_id, **updated_product}), local=True)
             try:
-                updated_product = {
-                    'name': str(fields['name'].value),
-                    'quantity': int(fields['quantity'].value),
-                    'price': float(price),
-                    'promotion_price': float(promotion_price),
-                    'category': str(fields['category'])
-                }
-                result = supabase.table("products").update(updated_product).eq('id', product_id).execute()
-
-                if not result.data:
-                    raise Exception(result.data)
-
-                self.refresh_product_list()
+                catalog.upsert(database.update_product(product_id, updated_product))
+            except Exception:
+                self.catalog_changed(product_id, previous, local=True)
+                raise
 
-            except Exception as e:
-                display_error_banner(self.page, str(e))
+        except Exception as e:
+            display_error_banner(self.page, str(e))
 
-        self.save_product_button.icon = ft.icons.SAVE_ROUNDED
-        self.page.update()
+        save_product_button.content = None
+        save_product_button.icon = ft.icons.SAVE_ROUNDED
+        request_update(self.page)
 
     def handle_delete(self, product):
-        self.delete_product_button.content = ft.ProgressRing(width=16, height=16, stroke_width=2, color=ft.colors.WHITE)
-        self.delete_product_button.icon = None
-        self.page.update()
-
         product_id = product['id']
+        if product_id not in self.buttons:
+            return
+        delete_product_button = self.buttons[product_id]['delete']
+        delete_product_button.content = ft.ProgressRing(width=16, height=16, stroke_width=2, color=ft.colors.WHITE)
+        delete_product_button.icon = None
+        flush_update(self.page)
+
+        # Hidden here now; cashiers keep the product, and their cart lines, until the delete is confirmed
+        previous = self.panels[product_id].data if product_id in self.panels else product
+        self.catalog_changed(product_id, None, local=True)
         try:
-            data = supabase.table('products').delete().eq('id', product_id).execute()
-            if not data.data:
-                raise Exception(data.data)
-            self.refresh_product_list()
+            database.delete_product(product_id)
         except Exception as e:
+            self.catalog_changed(product_id, previous, local=True)
             display_error_banner(self.page, str(e))
+        else:
+            catalog.remove(product_id)
 
-        self.delete_product_button.icon = ft.icons.SAVE_ROUNDED
-        self.page.update()
+        delete_product_button.content = None
+        delete_product_button.icon = ft.icons.DELETE_ROUNDED
+        request_update(self.page)
 
     def search_items(self):
-        query = self.search_field.value.lower()
-        if query:
-            filtered_data = [product for product in self.data if query in product["name"].lower()]
-            self.data = filtered_data
+        query = self.query = self.search_field.value or ""
+        self.limit = PRODUCTS_PAGE_SIZE
+        if query.strip():
+            self.populate_products(catalog.search_index().search(query))
         else:
-            self.data = fetch_data(self.page)
-
-        self.populate_products()
+            self.populate_products()
 
     def open_dlg(self, e):
         self.page.dialog = self.add_product_dlg
         self.add_product_dlg.open = True
-        self.page.update()
+        request_update(self.page)
 
     def close_dlg(self, e):
         self.add_product_dlg.open = False
-        self.page.update()
+        request_update(self.page)
 
     def save_product(self, e):
         def replace_comma(num):
@@ -232,21 +357,112 @@ class Products(ft.SafeArea):
         price = replace_comma(self.input_price.value)
 
         try:
-            data = supabase.table('products').insert({"name": self.input_name.value, "price": price,
-                                                      "quantity": self.input_quantity.value,
-                                                      "promotion_price": promotion_price,
-                                                      "category": self.input_category.value}).execute()
-            if not data.data:
-                raise Exception(data.data)
-            else:
-                self.close_dlg(e)
-                self.refresh_product_list()
-        except Exception as e:
-            display_error_banner(self.page, str(e))
-
-    def refresh_product_list(self):
-        self.data = fetch_data(page=self.page)
-        self.expansion_panel_list.controls.clear()
-        self.populate_products()
-        self.frontbox.refresh_products()
-        self.page.update()
+            new_product = {"name": self.input_name.value, "price": float(price),
+                           "quantity": int(self.input_quantity.value),
+                           "promotion_price": float(promotion_price),
+                           "category": self.input_category.value}
+        except ValueError as error:
+            display_error_banner(self.page, str(error))
+            return
+
+        # Shown in this admin's list under a placeholder id until Supabase
+        # assigns the real one; cashiers only see the product once it exists
+        placeholder_id = next(placeholder_ids)
+        self.close_dlg(e)
+        self.catalog_changed(placeholder_id, to_record({'id': placeholder_id, **new_product}), local=True)
+        try:
+            product = database.insert_product(new_product)
+        except Exception as error:
+            self.catalog_changed(placeholder_id, None, local=True)
+            display_error_banner(self.page, str(error))
+            return
+        self.catalog_changed(placeholder_id, None, local=True)
+        catalog.upsert(product)
+
+    # ==============================================
+    # BULK IMPORT / EXPORT
+    # ==============================================
+    def import_picked(self, e: ft.FilePickerResultEvent):
+        if not e.files:
+            return
+        file = e.files[0]
+        if file.path:
+            self.run_import(file.path)
+        else:
+            # Web sessions have no local path: upload to UPLOAD_DIR first.
+            # Signing the upload URL needs the FLET_SECRET_KEY secret
+            try:
+                upload_url = self.page.get_upload_url(file.name, 600)
+            except Exception as error:
+                display_error_banner(self.page, str(error))
+                return
+            self.import_picker.upload([ft.FilePickerUploadFile(file.name, upload_url=upload_url)])
+
+    def import_uploaded(self, e: ft.FilePickerUploadEvent):
+        if e.error:
+            display_error_banner(self.page, e.error)
+        elif e.progress == 1:
+            self.run_import(os.path.join(UPLOAD_DIR, e.file_name), remove=True)
+
+    def run_import(self, path: str, remove: bool = False):
+        self.import_status.value = "Importando..."
+        self.import_errors.controls.clear()
+        self.import_progress.visible = True
+        self.import_dlg.actions[0].disabled = True
+        self.page.dialog = self.import_dlg
+        self.import_dlg.open = True
+        request_update(self.page)
+
+        def progress(report):
+            self.import_status.value = str(report)
+            request_update(self.page)
+
+        def work():
+            try:
+                report = catalog_io.import_products(path, progress=progress)
+                self.import_status.value = str(report)
+                self.import_errors.controls = [ft.Text(f"Linha {line}: {message}", size=12)
+                                               for line, message in report.errors[:200]]
+            except Exception as e:
+                self.import_status.value = f"Error occurred: {e}"
+            finally:
+                if remove:
+                    os.remove(path)
+            self.import_progress.visible = False
+            self.import_dlg.actions[0].disabled = False
+            request_update(self.page)
+
+        threading.Thread(target=work, name="product-import", daemon=True).start()
+
+    def close_import_dlg(self, e):
+        self.import_dlg.open = False
+        request_update(self.page)
+
+    def export_products(self, e):
+        if not self.page.web:
+            self.export_picker.save_file(file_name="produtos.csv", allowed_extensions=["csv"])
+            return
+        # Browsers cannot be handed a save path: write the file to a folder of
+        # its own under an unguessable name in assets, let the browser download
+        # it and delete that folder (only this one) after EXPORT_TTL seconds
+        try:
+            token = uuid.uuid4().hex
+            folder = os.path.join(EXPORT_DIR, token)
+            os.makedirs(folder)
+            timer = threading.Timer(EXPORT_TTL, shutil.rmtree, (folder,), {"ignore_errors": True})
+            timer.daemon = True
+            timer.start()
+            with open(os.path.join(folder, "produtos.csv"), "w", newline="", encoding="utf-8") as file:
+                catalog_io.export_products(file)
+            self.page.launch_url(f"/exports/{token}/produtos.csv")
+        except Exception as error:
+            display_error_banner(self.page, str(error))
+
+    def export_picked(self, e: ft.FilePickerResultEvent):
+        if not e.path:
+            return
+        try:
+            with open(e.path, "w", newline="", encoding="utf-8") as file:
+                catalog_io.export_products(file)
+        except Exception as error:
+            display_error_banner(self.page, str(error))
@@ -1,14 +1,10 @@
 import flet as ft
 import os
-from supabase import create_client
 from dotenv import load_dotenv
 import time
-import requests
+from services.updates import flush_update, request_update
 
 load_dotenv()
-supabaseUrl = "https://crswolnvchmpqdjqldop.supabase.co"
-supabaseKey = os.environ.get("SUPABASE_KEY")
-supabase = create_client(supabase_url=supabaseUrl, supabase_key=supabaseKey)
 
 toggle_style_sheet: dict = {"icon": ft.icons.DARK_MODE_ROUNDED, "icon_size": 18}
 _dark: str = ft.colors.with_opacity(0.5, "white")
@@ -64,12 +60,12 @@ class Settings(ft.SafeArea):
             self.page.navigation_bar.bgcolor = ft.colors.GREY_900
             self.page.navigation_bar.active_color = ft.colors.WHITE70
 
-        self.page.update()
+        request_update(self.page)
 
     def send_message(self, e):
         self.call_me.content = ft.ProgressRing(width=16, height=16, stroke_width=2, color=ft.colors.WHITE)
         self.call_me.icon = None
-        self.page.update()
+        flush_update(self.page)
 
         time.sleep(0.1)
 
@@ -82,9 +78,10 @@ class Settings(ft.SafeArea):
             "chatId": f"556296163339@c.us",
             "message": f"Suporte necessário: Loja do Nova"
         }
+        import requests
         endpoint = 'https://waapi.app/api/v1/instances/6309/client/action/send-message'
         response = requests.post(endpoint, json=payload, headers=headers)
 
         self.call_me.text = "Call Support"
         self.call_me.icon = ft.icons.SEND_ROUNDED
-        self.page.update()
+        request_update(self.page)
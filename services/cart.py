@@ -0,0 +1,87 @@
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+
+
+def to_cents(value) -> int:
+    # Prices arrive as floats, strings or comma decimals ("12,90"); go through
+    # Decimal so 0.1 + 0.2 style errors never reach the stored totals
+    amount = Decimal(str(value).strip().replace(",", ".") or "0")
+    return int((amount * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def format_cents(cents: int) -> str:
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"R${sign}{cents // 100},{cents % 100:02d}"
+
+
+def unit_price_cents(product: dict) -> int:
+    promotion_price = to_cents(product['promotion_price'] or 0)
+    if promotion_price > 0:
+        return promotion_price
+    return to_cents(product['price'])
+
+
+class Cart:
+    """Quantities of the order being built, keyed by product id.
+
+    Prices are kept in integer cents and the total is updated on every change,
+    so a click costs the same no matter how many products are on screen.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self.total_cents = 0
+        self._lock = threading.Lock()
+
+    def quantity(self, product_id) -> int:
+        item = self._items.get(product_id)
+        return item[1] if item else 0
+
+    def _update(self, product: dict, change) -> int:
+        with self._lock:
+            unit_cents, current = self._items.get(product['id'], (unit_price_cents(product), 0))
+            quantity = max(int(change(current)), 0)
+            self.total_cents += unit_cents * (quantity - current)
+            if quantity:
+                self._items[product['id']] = (unit_cents, quantity)
+            else:
+                self._items.pop(product['id'], None)
+        return quantity
+
+    def set_quantity(self, product: dict, quantity: int) -> int:
+        return self._update(product, lambda current: quantity)
+
+    def add(self, product: dict, delta: int = 1) -> int:
+        return self._update(product, lambda current: current + delta)
+
+    def reprice(self, product: dict):
+        with self._lock:
+            item = self._items.get(product['id'])
+            if item is None:
+                return
+            unit_cents, quantity = item
+            new_unit_cents = unit_price_cents(product)
+            self.total_cents += (new_unit_cents - unit_cents) * quantity
+            self._items[product['id']] = (new_unit_cents, quantity)
+
+    def remove(self, product_id):
+        with self._lock:
+            item = self._items.pop(product_id, None)
+            if item is not None:
+                self.total_cents -= item[0] * item[1]
+
+    def items(self) -> list[dict]:
+        return [{"product_id": product_id, "quantity": quantity}
+                for product_id, (_, quantity) in self._items.items()]
+
+    def total(self) -> float:
+        return self.total_cents / 100
+
+    def clear(self):
+        with self._lock:
+            self._items = {}
+            self.total_cents = 0
+
+    def __bool__(self):
+        return bool(self._items)
@@ -0,0 +1,247 @@
+import bisect
+import os
+import queue
+import sys
+import threading
+import time
+import weakref
+from functools import lru_cache
+from typing import NamedTuple
+from services import database
+from services.cart import format_cents, to_cents
+from services.search import SearchIndex
+
+CATALOG_CACHE_TTL = float(os.environ.get("CATALOG_CACHE_TTL", "60"))
+
+
+@lru_cache(maxsize=65536)
+def price_label(price) -> str:
+    # Shared by every card showing the same price
+    return format_cents(to_cents(price or 0))
+
+
+class Product(NamedTuple):
+    """One catalog row, immutable and shared by every session.
+
+    A plain tuple (no per-record dict) that still answers ``product['name']``
+    like the dicts Supabase returns. Display prices are formatted once per
+    distinct price, process-wide.
+    """
+
+    id: int
+    name: str
+    quantity: int
+    price: float
+    promotion_price: float
+    category: str
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        return tuple.__getitem__(self, key)
+
+    def keys(self) -> tuple:
+        return self._fields
+
+    @property
+    def on_promotion(self) -> bool:
+        return to_cents(self.promotion_price or 0) > 0
+
+    @property
+    def price_label(self) -> str:
+        return price_label(self.price)
+
+    @property
+    def promotion_label(self) -> str:
+        return price_label(self.promotion_price)
+
+
+def to_record(product) -> Product:
+    category = product['category']
+    return Product(product['id'], product['name'], product['quantity'], product['price'],
+                   product['promotion_price'], sys.intern(category) if category else category)
+
+
+def sort_key(product) -> tuple:
+    return product['category'] or "", product['id']
+
+
+def load_products() -> tuple:
+    return tuple(to_record(product) for product in database.fetch_products() if product['name'])
+
+
+def patch(products, product_id, record=None) -> tuple:
+    """A copy of ``products`` with ``product_id`` replaced by ``record``, or dropped if it is None."""
+    products = [product for product in products if product['id'] != product_id]
+    if record is not None and record['name']:
+        bisect.insort(products, record, key=sort_key)
+    return tuple(products)
+
+
+class CatalogCache:
+    """Product catalog shared by every session of the process.
+
+    The table is loaded at most once per ``ttl`` seconds; sessions that miss at
+    the same time wait for a single load instead of each querying Supabase.
+    Writes made through the app patch the cached list in place and are
+    broadcast to every subscriber, so open sessions can patch their views
+    without fetching the catalog again. The catalog is an immutable tuple of
+    ``Product`` records handed out as is: sessions share it instead of
+    holding copies.
+    """
+
+    def __init__(self, loader=load_products, ttl: float = CATALOG_CACHE_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self.version = 0
+        self._products = None
+        self._loaded_at = 0.0
+        self._index = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._subscribers = []
+        self._changes = None
+
+    def _fresh(self):
+        with self._lock:
+            if self._products is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._products
+        return None
+
+    def get(self, force: bool = False) -> tuple:
+        if not force:
+            products = self._fresh()
+            if products is not None:
+                return products
+
+        started = time.monotonic()
+        with self._load_lock:
+            # Another session may have finished loading while we waited for the lock
+            with self._lock:
+                if self._products is not None and self._loaded_at >= started:
+                    return self._products
+            if not force:
+                products = self._fresh()
+                if products is not None:
+                    return products
+
+            products = self.loader()
+            with self._lock:
+                # An unchanged reload keeps the old tuple, so its search index stays valid
+                if products != self._products:
+                    self._products = products
+                    self.version += 1
+                self._loaded_at = time.monotonic()
+                return self._products
+
+    def search_index(self) -> SearchIndex:
+        """Search index for the current catalog, built once per version.
+
+        One session builds the index of a new version while the others keep
+        searching the previous one instead of waiting for the build.
+        """
+        self.get()
+        # The cached tuple is replaced, never modified, on every change
+        with self._lock:
+            products = self._products or ()
+            index = self._index
+        if index is not None and index.products is products:
+            return index
+        if not self._index_lock.acquire(blocking=index is None):
+            return index
+        try:
+            with self._lock:
+                products = self._products or ()
+                index = self._index
+            if index is None or index.products is not products:
+                index = SearchIndex(products)
+                with self._lock:
+                    self._index = index
+            return index
+        finally:
+            self._index_lock.release()
+
+    def peek(self):
+        """The cached catalog, or None when it is not loaded; never queries Supabase."""
+        with self._lock:
+            return self._products
+
+    def invalidate(self):
+        with self._lock:
+            self._products = None
+            self.version += 1
+
+    def upsert(self, product: dict):
+        record = to_record(product)
+        with self._lock:
+            if self._products is not None:
+                self._products = patch(self._products, record['id'], record)
+                self.version += 1
+        self.publish(record['id'], record if record['name'] else None)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._products is not None:
+                self._products = patch(self._products, product_id)
+                self.version += 1
+        self.publish(product_id, None)
+
+    def upsert_many(self, products: list):
+        """Patch many products at once and publish a single reload notice."""
+        records = {record['id']: record for record in map(to_record, products)}
+        with self._lock:
+            if self._products is not None:
+                kept = [product for product in self._products if product['id'] not in records]
+                kept += [record for record in records.values() if record['name']]
+                kept.sort(key=sort_key)
+                self._products = tuple(kept)
+                self.version += 1
+        self.publish(None, None)
+
+    # ==============================================
+    # CHANGE BROADCAST
+    # ==============================================
+    def subscribe(self, callback):
+        """Call ``callback(product_id, record)`` after every catalog write.
+
+        ``record`` is None when the product was deleted. ``product_id`` is None
+        after a bulk write: subscribers should re-read ``get()``, which is
+        already up to date and costs no request. Bound methods are held
+        weakly, so a closed session or an evicted tab unsubscribes itself.
+        """
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else (lambda: callback)
+        with self._lock:
+            self._subscribers.append(ref)
+
+    def publish(self, product_id, record: dict = None):
+        with self._lock:
+            if self._changes is None:
+                # Subscribers update their pages from one thread, in write order,
+                # so the admin's save does not wait on every open session
+                self._changes = queue.Queue()
+                threading.Thread(target=self._dispatch, name="catalog-changes", daemon=True).start()
+        self._changes.put((product_id, record))
+
+    def _dispatch(self):
+        while True:
+            product_id, record = self._changes.get()
+            with self._lock:
+                self._subscribers = [ref for ref in self._subscribers if ref() is not None]
+                subscribers = list(self._subscribers)
+            for ref in subscribers:
+                callback = ref()
+                if callback is None:
+                    continue
+                try:
+                    callback(product_id, record)
+                except Exception:
+                    # One broken session must not keep the others stale
+                    pass
+            self._changes.task_done()
+
+
+catalog = CatalogCache()
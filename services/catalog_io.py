@@ -0,0 +1,199 @@
+import csv
+import io
+import os
+import sys
+from services import database
+from services.catalog import catalog
+from services.search import normalize
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+
+# Spreadsheet headers (lowercased, accents kept) accepted for each column. Only
+# our own export's "id" is read as the product id: a supplier's "código" is theirs
+HEADERS = {
+    'id': ('id',),
+    'name': ('name', 'nome', 'produto'),
+    'quantity': ('quantity', 'quantidade', 'estoque'),
+    'price': ('price', 'preço', 'preco'),
+    'promotion_price': ('promotion_price', 'preço promoção', 'preço promocional', 'preco promocional',
+                        'promoção', 'promocao'),
+    'category': ('category', 'categoria'),
+}
+
+# Filled in only for rows that create a product
+NEW_PRODUCT = {'quantity': 0, 'price': 0.0, 'promotion_price': 0.0, 'category': None}
+
+
+def parse_price(value) -> float:
+    """"R$ 1.234,56", "1234,56" and "1234.56" all give 1234.56."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or "").replace("R$", "").replace(" ", "").strip()
+    if not text:
+        return 0.0
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    return float(text)
+
+
+def parse_quantity(value) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value or "").strip()
+    return int(float(text.replace(",", "."))) if text else 0
+
+
+def to_product(row: dict) -> dict:
+    """Validate one spreadsheet row; raises ValueError with a readable message.
+
+    Only the columns the row has a value for are returned, so updating a
+    product leaves the fields the sheet does not carry as they are.
+    """
+    name = str(row.get('name') or "").strip()
+    if not name:
+        raise ValueError("nome vazio")
+    product = {'name': name}
+    if str(row.get('category') or "").strip():
+        product['category'] = str(row['category']).strip()
+    for key, parse in (('price', parse_price), ('promotion_price', parse_price), ('quantity', parse_quantity),
+                       ('id', parse_quantity)):
+        if row.get(key) in (None, ""):
+            continue
+        try:
+            product[key] = parse(row[key])
+        except ValueError:
+            raise ValueError(f"{key} inválido: {row[key]!r}")
+        if product[key] < 0:
+            raise ValueError(f"{key} negativo: {row[key]!r}")
+    return product
+
+
+def map_headers(header: list) -> list:
+    names = {alias: column for column, aliases in HEADERS.items() for alias in aliases}
+    return [names.get(str(cell or "").strip().lower()) for cell in header]
+
+
+def read_rows(path: str):
+    """Yield ``(line, row)`` from a CSV or XLSX file without loading it whole."""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise Exception("openpyxl is required to import .xlsx files")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            lines = workbook.active.iter_rows(values_only=True)
+            yield from _rows(lines)
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            sample = file.read(4096)
+            file.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t") if sample else csv.excel
+            yield from _rows(csv.reader(file, dialect))
+
+
+def _rows(lines):
+    columns = None
+    for line, cells in enumerate(lines, start=1):
+        if columns is None:
+            columns = map_headers(cells)
+            if 'name' not in columns:
+                raise Exception("a planilha precisa de uma coluna 'nome'")
+            continue
+        if not any(cell not in (None, "") for cell in cells):
+            continue
+        yield line, {column: cell for column, cell in zip(columns, cells) if column}
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors = []
+
+    def __str__(self):
+        return f"{self.imported} de {self.rows} produtos importados, {len(self.errors)} com erro"
+
+
+def import_products(path: str, batch_size: int = IMPORT_BATCH_SIZE, progress=None) -> ImportReport:
+    """Upsert every valid row of ``path`` in batches of ``batch_size``.
+
+    Invalid rows, and rows of a batch Supabase rejected, are collected in
+    ``report.errors`` as ``(line, message)``; the import carries on with the
+    next batch. ``progress(report)`` is called after every batch. Rows
+    without an id update the product with the same name, if there is one,
+    so re-importing a supplier's price list does not duplicate products;
+    only the columns in the file are written. An id that is not in the
+    catalog is reported as an error rather than created.
+    """
+    report = ImportReport()
+    batch = []
+    products = catalog.get()
+    known_ids = {product['id'] for product in products}
+    ids_by_name = {normalize(product['name']): product['id'] for product in products}
+
+    def flush():
+        try:
+            stored = database.upsert_products([product for _, product in batch])
+        except Exception as e:
+            report.errors += [(line, str(e)) for line, _ in batch]
+        else:
+            report.imported += len(stored)
+            catalog.upsert_many(stored)
+        batch.clear()
+        if progress is not None:
+            progress(report)
+
+    for line, row in read_rows(path):
+        report.rows += 1
+        try:
+            product = to_product(row)
+            if 'id' in product and product['id'] not in known_ids:
+                raise ValueError(f"id desconhecido: {product['id']}")
+            if 'id' not in product and normalize(product['name']) in ids_by_name:
+                product['id'] = ids_by_name[normalize(product['name'])]
+            if 'id' not in product:
+                product = {**NEW_PRODUCT, **product}
+            batch.append((line, product))
+        except ValueError as e:
+            report.errors.append((line, str(e)))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
+
+
+def export_csv(page_size: int = database.CATALOG_PAGE_SIZE):
+    """Yield the CSV export in chunks, for streaming it to a response or file."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(database.PRODUCT_COLUMNS)
+    for rows in database.iter_products(page_size=page_size):
+        writer.writerows([[row[column] for column in database.PRODUCT_COLUMNS] for row in rows])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_products(file, page_size: int = database.CATALOG_PAGE_SIZE):
+    """Write the products table to ``file`` as CSV, one page of rows at a time."""
+    for chunk in export_csv(page_size):
+        file.write(chunk)
+
+
+# python -m services.catalog_io import precos.xlsx | export produtos.csv
+if __name__ == "__main__":
+    command, path = sys.argv[1:3]
+    if command == "import":
+        result = import_products(path, progress=lambda report: print(report, file=sys.stderr))
+        for line, message in result.errors:
+            print(f"linha {line}: {message}", file=sys.stderr)
+        print(result)
+    elif command == "export":
+        with open(path, "w", newline="", encoding="utf-8") as output:
+            export_products(output)
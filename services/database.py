@@ -0,0 +1,240 @@
+import os
+import threading
+from contextlib import contextmanager
+import httpx
+from dotenv import load_dotenv
+from services import metrics
+
+load_dotenv()
+supabaseUrl = "https://crswolnvchmpqdjqldop.supabase.co"
+supabaseKey = os.environ.get("SUPABASE_KEY")
+
+POOL_SIZE = int(os.environ.get("SUPABASE_POOL_SIZE", "25"))
+KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_KEEPALIVE_EXPIRY", "120"))
+CONNECT_TIMEOUT = float(os.environ.get("SUPABASE_CONNECT_TIMEOUT", "5"))
+CATALOG_TIMEOUT = float(os.environ.get("SUPABASE_CATALOG_TIMEOUT", "10"))
+ORDER_TIMEOUT = float(os.environ.get("SUPABASE_ORDER_TIMEOUT", "8"))
+ANALYTICS_TIMEOUT = float(os.environ.get("SUPABASE_ANALYTICS_TIMEOUT", "30"))
+ORDER_RETRIES = int(os.environ.get("SUPABASE_ORDER_RETRIES", "2"))
+CATALOG_PAGE_SIZE = int(os.environ.get("CATALOG_PAGE_SIZE", "1000"))
+
+PRODUCT_COLUMNS = ("id", "name", "quantity", "price", "promotion_price", "category")
+ANALYTICS_COLUMNS = {
+    "orders": ("id", "created_at", "user_id", "detail_id", "payment_type", "total"),
+    "order_details": ("id", "created_at", "product_id", "quantity"),
+    "users": ("id", "age"),
+}
+
+_call = threading.local()
+
+
+def _apply_call_timeout(request: httpx.Request):
+    # httpx reads the timeout from the request extensions, so each call can
+    # override the pool default without needing its own client
+    timeout = getattr(_call, "timeout", None)
+    if timeout is not None:
+        request.extensions["timeout"] = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT).as_dict()
+
+
+@contextmanager
+def call_timeout(seconds: float, operation: str = "other"):
+    """Apply ``seconds`` to the requests made inside; time them as ``operation``."""
+    previous = getattr(_call, "timeout", None)
+    _call.timeout = seconds
+    metrics.supabase_requests.inc(operation=operation)
+    try:
+        with metrics.supabase_seconds.time(operation=operation):
+            yield
+    except Exception:
+        metrics.supabase_errors.inc(operation=operation)
+        raise
+    finally:
+        _call.timeout = previous
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide Supabase client, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # supabase pulls in postgrest, gotrue, storage and realtime: import
+            # it on the first data call rather than at startup
+            from supabase import create_client, ClientOptions
+            http_client = httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                timeout=httpx.Timeout(CATALOG_TIMEOUT, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+                                    keepalive_expiry=KEEPALIVE_EXPIRY),
+                event_hooks={"request": [_apply_call_timeout]},
+            )
+            _client = create_client(supabase_url=supabaseUrl, supabase_key=supabaseKey,
+                                    options=ClientOptions(httpx_client=http_client))
+        return _client
+
+
+# ==============================================
+# CATALOG
+# ==============================================
+def iter_pages(table: str, columns: tuple, after_id=None, page_size: int = CATALOG_PAGE_SIZE,
+               timeout: float = CATALOG_TIMEOUT):
+    # Keyset pagination on id: every page is an index range scan, and the
+    # PostgREST max-rows cap no longer truncates large tables
+    while True:
+        query = get_client().table(table).select(", ".join(columns)).order("id").limit(page_size)
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        with call_timeout(timeout, f"select_{table}"):
+            rows = query.execute().data
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]['id']
+
+
+def fetch_products() -> list[dict]:
+    products = [product for rows in iter_pages("products", PRODUCT_COLUMNS) for product in rows]
+    products.sort(key=lambda product: (product['category'] or "", product['id']))
+    return products
+
+
+def iter_products(page_size: int = CATALOG_PAGE_SIZE):
+    """The products table in id order, one page of rows at a time."""
+    return iter_pages("products", PRODUCT_COLUMNS, page_size=page_size)
+
+
+def upsert_products(products: list[dict]) -> list[dict]:
+    """Write a batch of products in as few requests as possible.
+
+    Rows carrying an ``id`` update only the columns they have; the others are
+    inserted. A bulk upsert sends one column list for every row, so updates
+    are grouped by the columns they carry. Returns the stored rows.
+    """
+    updates = {}
+    for product in products:
+        if product.get('id') is not None:
+            updates.setdefault(tuple(sorted(product)), []).append(product)
+    new = [{key: value for key, value in product.items() if key != 'id'}
+           for product in products if product.get('id') is None]
+    stored = []
+    with call_timeout(CATALOG_TIMEOUT, "upsert_products"):
+        for existing in updates.values():
+            stored += get_client().table("products").upsert(existing, on_conflict="id").execute().data
+        if new:
+            stored += get_client().table("products").insert(new).execute().data
+    if len(stored) != len(products):
+        raise Exception(stored)
+    return stored
+
+
+def insert_product(product: dict) -> dict:
+    with call_timeout(CATALOG_TIMEOUT, "insert_product"):
+        result = get_client().table("products").insert(product).execute()
+    if not result.data:
+        raise Exception(result.data)
+    return result.data[0]
+
+
+def update_product(product_id: int, product: dict) -> dict:
+    with call_timeout(CATALOG_TIMEOUT, "update_product"):
+        result = get_client().table("products").update(product).eq('id', product_id).execute()
+    if not result.data:
+        raise Exception(result.data)
+    return result.data[0]
+
+
+def delete_product(product_id: int) -> dict:
+    with call_timeout(CATALOG_TIMEOUT, "delete_product"):
+        result = get_client().table("products").delete().eq('id', product_id).execute()
+    if not result.data:
+        raise Exception(result.data)
+    return result.data[0]
+
+
+# ==============================================
+# ORDERS
+# ==============================================
+def commit_order(customer: dict, items: list[dict], payment_type: str, total: float,
+                 idempotency_key: str) -> int:
+    """Store the customer, line items and order header in one transaction.
+
+    Runs the ``commit_order`` function from supabase/migrations in a single
+    request and returns the order id. Calling it again with the same
+    ``idempotency_key`` returns the existing order, so timeouts can be retried.
+    """
+    params = {
+        "p_customer": customer,
+        "p_items": items,
+        "p_payment_type": payment_type,
+        "p_total": total,
+        "p_idempotency_key": str(idempotency_key),
+    }
+    for attempt in range(ORDER_RETRIES + 1):
+        try:
+            with call_timeout(ORDER_TIMEOUT, "commit_order"):
+                return get_client().rpc("commit_order", params).execute().data
+        except httpx.TransportError:
+            if attempt == ORDER_RETRIES:
+                raise
+
+
+def commit_orders(orders: list[dict]) -> list[dict]:
+    """Commit a batch of journaled orders in one request.
+
+    Each order holds ``customer``, ``items``, ``payment_type``, ``total`` and
+    ``idempotency_key``. Orders are committed independently; the result has
+    one ``{idempotency_key, order_id, error}`` row per order.
+    """
+    with call_timeout(ORDER_TIMEOUT, "commit_orders"):
+        return get_client().rpc("commit_orders", {"p_orders": orders}).execute().data
+
+
+# ==============================================
+# ANALYTICS
+# ==============================================
+def fetch_analytics(watermarks: dict = None) -> dict[str, list]:
+    """Order, line item and user rows with ids above the given ``watermarks``.
+
+    ``watermarks`` maps a table name to the highest id already loaded; tables
+    without one are read in full.
+    """
+    watermarks = watermarks or {}
+    return {
+        table: [row for rows in iter_pages(table, columns, watermarks.get(table), timeout=ANALYTICS_TIMEOUT)
+                for row in rows]
+        for table, columns in ANALYTICS_COLUMNS.items()
+    }
+
+
+def fetch_dashboard_summary(timezone: str, top: int = 8) -> dict:
+    """Today's KPIs and the top-selling tables, aggregated by Postgres.
+
+    "Today" is the current day in ``timezone``. See the ``dashboard_summary``
+    function in supabase/migrations for the exact definitions.
+    """
+    with call_timeout(ANALYTICS_TIMEOUT, "dashboard_summary"):
+        return get_client().rpc("dashboard_summary", {"p_timezone": timezone, "p_top": top}).execute().data
+
+
+# ==============================================
+# BACKEND
+# ==============================================
+REPOSITORY = ("fetch_products", "iter_products", "upsert_products",
+              "insert_product", "update_product", "delete_product",
+              "commit_order", "commit_orders", "fetch_analytics", "fetch_dashboard_summary")
+
+
+def use_backend(backend):
+    """Route every repository function to ``backend`` instead of Supabase."""
+    globals().update({name: getattr(backend, name) for name in REPOSITORY})
+
+
+DATA_BACKEND = os.environ.get("DATA_BACKEND", "supabase")
+if DATA_BACKEND == "memory":
+    from services.memory_backend import MemoryBackend
+    use_backend(MemoryBackend())
@@ -0,0 +1,89 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+ORDER_JOURNAL_PATH = os.environ.get("ORDER_JOURNAL_PATH", "orders.db")
+
+
+class OrderJournal:
+    """Append-only local log of orders waiting to reach Supabase.
+
+    Orders are written here first (SQLite in WAL mode, fsynced on every
+    commit) so a sale survives network outages and restarts. Rows are keyed
+    by the order's idempotency key; the flusher marks them committed once
+    Supabase acknowledged them.
+    """
+
+    def __init__(self, path: str = ORDER_JOURNAL_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                idempotency_key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                order_id INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_status ON orders (status, created_at)")
+
+    def append(self, order: dict):
+        # A failed order that is appended again goes back in the queue
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO orders (idempotency_key, payload, created_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (idempotency_key) DO UPDATE SET status = 'pending', last_error = NULL "
+                "WHERE status = 'failed'",
+                (order["idempotency_key"], json.dumps(order), time.time())
+            )
+
+    def pending(self, limit: int) -> list[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM orders WHERE status = 'pending' ORDER BY created_at LIMIT ?", (limit,)
+            ).fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    def record_attempt(self, keys: list[str], error: str):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE orders SET attempts = attempts + 1, last_error = ? WHERE idempotency_key = ?",
+                [(error, key) for key in keys]
+            )
+
+    def mark_committed(self, key: str, order_id: int):
+        with self._lock:
+            self._db.execute(
+                "UPDATE orders SET status = 'committed', order_id = ?, attempts = attempts + 1, last_error = NULL "
+                "WHERE idempotency_key = ?", (order_id, key)
+            )
+
+    def mark_failed(self, key: str, error: str):
+        with self._lock:
+            self._db.execute(
+                "UPDATE orders SET status = 'failed', attempts = attempts + 1, last_error = ? "
+                "WHERE idempotency_key = ?", (error, key)
+            )
+
+    def discard(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM orders WHERE idempotency_key = ? AND status = 'failed'", (key,))
+
+    def prune(self, older_than: float):
+        with self._lock:
+            self._db.execute("DELETE FROM orders WHERE status = 'committed' AND created_at < ?", (older_than,))
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM orders GROUP BY status").fetchall())
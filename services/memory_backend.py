@@ -0,0 +1,181 @@
+import itertools
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from services.database import ANALYTICS_COLUMNS
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MemoryBackend:
+    """In-process stand-in for the Supabase tables, for tests and benchmarks.
+
+    Implements the repository functions of services.database with the same
+    arguments, return values and error behaviour. Select it with
+    ``DATA_BACKEND=memory`` or ``database.use_backend(MemoryBackend())``.
+    """
+
+    def __init__(self, products: list = None):
+        self.products = {}
+        self.users = {}
+        self.order_details = {}
+        self.orders = {}
+        self.idempotency_keys = {}
+        self._ids = {table: itertools.count(1) for table in ("products", "users", "order_details", "orders")}
+        self._lock = threading.Lock()
+        for product in products or []:
+            self.insert_product(product)
+
+    def _insert(self, table: str, row: dict) -> dict:
+        row = {"id": next(self._ids[table]), "created_at": now(), **row}
+        getattr(self, table)[row["id"]] = row
+        return dict(row)
+
+    def bulk_insert(self, table: str, rows: list[dict]) -> list[int]:
+        """Store ``rows`` as given (``created_at`` included), assigning ids; for seeding."""
+        with self._lock:
+            stored = getattr(self, table)
+            ids = []
+            for row in rows:
+                row = {"created_at": now(), **row, "id": next(self._ids[table])}
+                stored[row["id"]] = row
+                ids.append(row["id"])
+            return ids
+
+    # CATALOG
+    def fetch_products(self) -> list[dict]:
+        with self._lock:
+            products = [dict(product) for product in self.products.values()]
+        products.sort(key=lambda product: (product['category'] or "", product['id']))
+        return products
+
+    def iter_products(self, page_size: int = 1000):
+        with self._lock:
+            products = [dict(self.products[product_id]) for product_id in sorted(self.products)]
+        for start in range(0, len(products), page_size):
+            yield products[start:start + page_size]
+
+    def upsert_products(self, products: list[dict]) -> list[dict]:
+        stored = []
+        with self._lock:
+            for product in products:
+                if product.get('id') in self.products:
+                    self.products[product['id']].update(product)
+                    stored.append(dict(self.products[product['id']]))
+                else:
+                    stored.append(self._insert("products", {"name": None, "quantity": 0, "price": 0,
+                                                            "promotion_price": 0, "category": None,
+                                                            **{key: value for key, value in product.items()
+                                                               if key != 'id' or value is not None}}))
+        return stored
+
+    def insert_product(self, product: dict) -> dict:
+        with self._lock:
+            return self._insert("products", {"name": None, "quantity": 0, "price": 0, "promotion_price": 0,
+                                             "category": None, **product})
+
+    def update_product(self, product_id: int, product: dict) -> dict:
+        with self._lock:
+            if product_id not in self.products:
+                raise Exception([])
+            self.products[product_id].update(product)
+            return dict(self.products[product_id])
+
+    def delete_product(self, product_id: int) -> dict:
+        with self._lock:
+            if product_id not in self.products:
+                raise Exception([])
+            return self.products.pop(product_id)
+
+    # ORDERS
+    def commit_order(self, customer: dict, items: list[dict], payment_type: str, total: float,
+                     idempotency_key: str) -> int:
+        with self._lock:
+            existing = self.idempotency_keys.get(str(idempotency_key))
+            if existing is not None:
+                return existing
+            for item in items:
+                if item["product_id"] not in self.products:
+                    raise Exception(f"product {item['product_id']} does not exist")
+
+            user = self._insert("users", {"name": customer.get("name"), "email": customer.get("email"),
+                                          "phone": customer.get("phone"),
+                                          "age": int(customer["age"]) if customer.get("age") else None})
+            details = [self._insert("order_details", {"product_id": item["product_id"], "quantity": item["quantity"]})
+                       for item in items]
+            order = self._insert("orders", {"user_id": user["id"], "detail_id": details[0]["id"] if details else None,
+                                            "payment_type": payment_type, "total": total,
+                                            "idempotency_key": str(idempotency_key)})
+            self.idempotency_keys[str(idempotency_key)] = order["id"]
+            return order["id"]
+
+    def commit_orders(self, orders: list[dict]) -> list[dict]:
+        results = []
+        for order in orders:
+            try:
+                order_id = self.commit_order(order["customer"], order["items"], order["payment_type"],
+                                             order["total"], order["idempotency_key"])
+                results.append({"idempotency_key": order["idempotency_key"], "order_id": order_id, "error": None})
+            except Exception as e:
+                results.append({"idempotency_key": order["idempotency_key"], "order_id": None, "error": str(e)})
+        return results
+
+    # ANALYTICS
+    def fetch_analytics(self, watermarks: dict = None) -> dict[str, list]:
+        watermarks = watermarks or {}
+        with self._lock:
+            return {
+                table: [{column: row.get(column) for column in columns}
+                        for row_id, row in getattr(self, table).items()
+                        if watermarks.get(table) is None or row_id > watermarks[table]]
+                for table, columns in ANALYTICS_COLUMNS.items()
+            }
+
+    def fetch_dashboard_summary(self, timezone: str, top: int = 8) -> dict:
+        # Mirrors public.dashboard_summary in supabase/migrations
+        zone = ZoneInfo(timezone)
+        today = datetime.now(zone).date()
+
+        def is_today(row):
+            return datetime.fromisoformat(row["created_at"]).astimezone(zone).date() == today
+
+        with self._lock:
+            orders_today = [order for order in self.orders.values() if is_today(order)]
+            sold = defaultdict(int)
+            for detail in self.order_details.values():
+                product = self.products.get(detail["product_id"])
+                if product is not None:
+                    sold[product["name"]] += detail["quantity"]
+
+            per_age = defaultdict(int)
+            for order in self.orders.values():
+                detail = self.order_details.get(order["detail_id"])
+                user = self.users.get(order["user_id"])
+                product = self.products.get(detail["product_id"]) if detail else None
+                if product is not None and user is not None and user["age"] is not None:
+                    per_age[(user["age"], product["name"])] += detail["quantity"]
+
+            products_sold_today = sum(detail["quantity"] for detail in self.order_details.values()
+                                      if is_today(detail))
+
+        best_per_age = {}
+        for (age, name), quantity in sorted(per_age.items(), key=lambda item: (item[0][0], -item[1], item[0][1])):
+            best_per_age.setdefault(age, (name, quantity))
+        per_age_group = {}
+        for age, (name, quantity) in sorted(best_per_age.items()):
+            if 10 <= age < 40:
+                group = 10 + (age - 10) // 5 * 5
+                per_age_group.setdefault(f"{group}-{group + 5}", (name, quantity))
+
+        most_sold = sorted(sold.items(), key=lambda item: (-item[1], item[0]))[:top]
+        return {
+            "total_sold_today": round(sum(float(order["total"]) for order in orders_today), 2),
+            "orders_total_today": len(orders_today),
+            "products_sold_today": products_sold_today,
+            "most_sold_products": [{"name": name, "quantity_order_details": quantity} for name, quantity in most_sold],
+            "most_sold_products_per_age": [{"age_group": group, "name": name, "quantity_order_details": quantity}
+                                           for group, (name, quantity) in per_age_group.items()],
+        }
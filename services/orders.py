@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from services import database, metrics
+from services.journal import OrderJournal
+
+ORDER_FLUSH_BATCH = int(os.environ.get("ORDER_FLUSH_BATCH", "50"))
+ORDER_FLUSH_INTERVAL = float(os.environ.get("ORDER_FLUSH_INTERVAL", "5"))
+ORDER_BACKOFF_MAX = float(os.environ.get("ORDER_BACKOFF_MAX", "60"))
+ORDER_JOURNAL_RETENTION = float(os.environ.get("ORDER_JOURNAL_RETENTION", str(7 * 24 * 3600)))
+
+
+_commit_listeners = []
+
+
+def add_commit_listener(callback):
+    """Call ``callback()`` after every flush that committed at least one order."""
+    _commit_listeners.append(callback)
+
+
+class PendingOrder:
+    """Handle for an order that is being committed in the background."""
+
+    def __init__(self, customer: dict, items: list[dict], payment_type: str, total: float, idempotency_key):
+        self.customer = customer
+        self.items = items
+        self.payment_type = payment_type
+        self.total = total
+        self.idempotency_key = str(idempotency_key)
+        self.order_id = None
+        self.error = None
+        self.rejected = False
+        self.submitted_at = None
+        self.done = threading.Event()
+
+    @property
+    def status(self) -> str:
+        if self.order_id is not None:
+            return "committed"
+        if self.rejected:
+            return "failed"
+        # Not reached Supabase yet; the journal keeps retrying
+        return "retrying" if self.error is not None else "pending"
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.done.wait(timeout)
+
+    def payload(self) -> dict:
+        return {
+            "idempotency_key": self.idempotency_key,
+            "customer": self.customer,
+            "items": self.items,
+            "payment_type": self.payment_type,
+            "total": self.total,
+        }
+
+
+class OrderFlusher:
+    """Moves journaled orders to Supabase in batches from a single thread.
+
+    Every pass sends up to ``batch_size`` pending orders in one
+    ``commit_orders`` call. Network errors leave them queued and back off
+    exponentially up to ``ORDER_BACKOFF_MAX``; orders Supabase rejects are
+    marked failed. Idempotency keys make a replayed batch harmless, so an
+    order is stored exactly once even if an acknowledgement is lost.
+    """
+
+    def __init__(self, journal: OrderJournal, batch_size: int = ORDER_FLUSH_BATCH):
+        self.journal = journal
+        self.batch_size = batch_size
+        self.backoff = 0.0
+        self._watchers = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="order-flusher", daemon=True)
+                self._thread.start()
+                self._wake.set()
+
+    def submit(self, pending: PendingOrder, on_done=None):
+        pending.error = None
+        pending.rejected = False
+        pending.done.clear()
+        pending.submitted_at = time.monotonic()
+        self.journal.append(pending.payload())
+        metrics.checkout_seconds.observe(time.monotonic() - pending.submitted_at, stage="journal")
+        with self._lock:
+            self._watchers[pending.idempotency_key] = (pending, on_done)
+        self.start()
+        self._wake.set()
+
+    def discard(self, pending: PendingOrder):
+        self.journal.discard(pending.idempotency_key)
+        with self._lock:
+            self._watchers.pop(pending.idempotency_key, None)
+
+    def _notify(self, key: str, order_id=None, error=None, rejected=False):
+        with self._lock:
+            pending, on_done = self._watchers.get(key, (None, None))
+            if pending is not None and (order_id is not None or rejected):
+                del self._watchers[key]
+        if pending is None:
+            return
+        if order_id is not None:
+            metrics.checkout_seconds.observe(time.monotonic() - pending.submitted_at, stage="committed")
+        pending.order_id = order_id
+        pending.error = error
+        pending.rejected = rejected
+        if order_id is not None or rejected:
+            pending.done.set()
+        if on_done is not None:
+            on_done(pending)
+
+    def flush(self) -> int:
+        orders = self.journal.pending(self.batch_size)
+        if not orders:
+            return 0
+        keys = [order["idempotency_key"] for order in orders]
+        try:
+            results = database.commit_orders(orders)
+        except Exception as e:
+            self.journal.record_attempt(keys, str(e))
+            for key in keys:
+                self._notify(key, error=e)
+            raise
+
+        for result in results:
+            key = str(result["idempotency_key"])
+            if result["error"]:
+                self.journal.mark_failed(key, result["error"])
+                self._notify(key, error=Exception(result["error"]), rejected=True)
+            else:
+                self.journal.mark_committed(key, result["order_id"])
+                self._notify(key, order_id=result["order_id"])
+        if any(not result["error"] for result in results):
+            for listener in _commit_listeners:
+                listener()
+        return len(orders)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.backoff or ORDER_FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                flushed = self.flush()
+            except Exception:
+                self.backoff = min(max(self.backoff * 2, 1.0), ORDER_BACKOFF_MAX)
+                continue
+            self.backoff = 0.0
+            if flushed == self.batch_size:
+                self._wake.set()
+            elif not flushed:
+                self.journal.prune(time.time() - ORDER_JOURNAL_RETENTION)
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def get_flusher() -> OrderFlusher:
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = OrderFlusher(OrderJournal())
+        return _flusher
+
+
+def start():
+    """Start flushing; orders left in the journal by a previous run go first."""
+    get_flusher().start()
+
+
+def submit_order(pending: PendingOrder, on_done=None) -> PendingOrder:
+    """Journal ``pending`` locally and return at once.
+
+    ``on_done(pending)`` runs on the flusher thread after every attempt, so
+    the caller can tell committed, failed and retrying orders apart.
+    Submitting a failed order again puts it back in the queue under the same
+    idempotency key.
+    """
+    get_flusher().submit(pending, on_done)
+    return pending
+
+
+def discard_order(pending: PendingOrder):
+    get_flusher().discard(pending)
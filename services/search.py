@@ -0,0 +1,175 @@
+import heapq
+import os
+import threading
+import unicodedata
+from functools import partial
+
+LIVE_SEARCH = os.environ.get("LIVE_SEARCH", "1") != "0"
+SEARCH_DEBOUNCE = float(os.environ.get("SEARCH_DEBOUNCE", "0.25"))
+
+
+def normalize(text) -> str:
+    # "Calça Jeans" -> "calca jeans", so cashiers can type without accents
+    decomposed = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def matches(product: dict, query: str) -> bool:
+    """Whether ``product`` would be among ``SearchIndex.search(query)``'s results."""
+    name = normalize(product['name'])
+    return all(term in name and (len(term) > SearchIndex.PREFIX_LENGTH or SearchIndex._word_prefix(name, term))
+               for term in normalize(query).split())
+
+
+class SearchIndex:
+    """Read-only name index over one version of the catalog.
+
+    Terms of three or more characters are looked up by trigram, shorter ones by
+    word prefix; candidates are then checked against the normalized name so
+    the result is the same as a substring scan. The products list is never
+    modified.
+    """
+
+    PREFIX_LENGTH = 2
+
+    def __init__(self, products: list):
+        self.products = products
+        self._names = []
+        self._grams = {}
+        self._prefixes = {}
+        self._categories = {}
+
+        for position, product in enumerate(products):
+            name = normalize(product['name'])
+            self._names.append(name)
+            for gram in trigrams(name):
+                self._grams.setdefault(gram, []).append(position)
+            prefixes = {token[:length] for token in name.split()
+                        for length in range(1, self.PREFIX_LENGTH + 1)}
+            for prefix in prefixes:
+                self._prefixes.setdefault(prefix, []).append(position)
+            self._categories.setdefault(normalize(product['category']), []).append(position)
+
+    def _candidates(self, terms: list) -> set:
+        """Positions having every short term as a word prefix and every trigram of the longer ones.
+
+        Exact for terms of up to three characters; longer terms still need a
+        substring check, since their trigrams may sit apart in the name.
+        """
+        postings = []
+        for term in terms:
+            if len(term) <= self.PREFIX_LENGTH:
+                postings.append(self._prefixes.get(term, ()))
+            else:
+                postings.extend(self._grams.get(gram, ()) for gram in trigrams(term))
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for positions in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(positions)
+        return candidates
+
+    @staticmethod
+    def _word_prefix(name: str, term: str) -> bool:
+        return name.startswith(term) or f" {term}" in name
+
+    def _rank(self, position: int, query: str, terms: list) -> tuple:
+        name = self._names[position]
+        if name == query:
+            score = 0
+        elif name.startswith(query):
+            score = 1
+        elif all(self._word_prefix(name, term) for term in terms):
+            score = 2
+        else:
+            score = 3
+        return score, position
+
+    def search(self, query: str = "", category: str = None, limit: int = None, cancelled=None,
+               rank: bool = True) -> list:
+        """Products matching every term of ``query``, best matches first.
+
+        With ``rank=False`` they come in catalog order and are not scored, for
+        callers that only filter. ``cancelled`` is polled while candidates are
+        checked; when it returns True the search stops and returns None.
+        """
+        query = " ".join(normalize(query).split())
+        terms = query.split()
+
+        if category:
+            allowed = self._categories.get(normalize(category), [])
+        else:
+            allowed = None
+
+        if not terms:
+            positions = range(len(self.products)) if allowed is None else allowed
+            results = [self.products[position] for position in positions]
+            return results[:limit] if limit else results
+
+        candidates = self._candidates(terms)
+        if allowed is not None:
+            candidates.intersection_update(allowed)
+
+        long_terms = [term for term in terms if len(term) > 3]
+        if long_terms:
+            matches = []
+            for checked, position in enumerate(candidates):
+                if cancelled is not None and checked % 1024 == 0 and cancelled():
+                    return None
+                name = self._names[position]
+                if all(term in name for term in long_terms):
+                    matches.append(position)
+        else:
+            matches = candidates
+
+        if not rank:
+            return [self.products[position] for position in sorted(matches)[:limit or None]]
+        key = partial(self._rank, query=query, terms=terms)
+        if limit:
+            matches = heapq.nsmallest(limit, matches, key=key)
+        else:
+            matches = sorted(matches, key=key)
+        return [self.products[position] for position in matches]
+
+    def categories(self) -> list:
+        return sorted({product['category'] for product in self.products if product['category']})
+
+
+class Debouncer:
+    """Calls ``callback(generation)`` once input has been quiet for ``wait`` seconds.
+
+    Every call starts a new generation and drops the pending timer, so a
+    callback can use ``is_current`` to abandon work that newer input replaced.
+    """
+
+    def __init__(self, callback, wait: float = SEARCH_DEBOUNCE):
+        self.callback = callback
+        self.wait = wait
+        self.generation = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.wait, self.callback, args=(self.generation,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self) -> int:
+        with self._lock:
+            self.generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            return self.generation
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self.generation
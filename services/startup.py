@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Print the startup breakdown on stderr once the first session is served
+STARTUP_REPORT = os.environ.get("STARTUP_REPORT", "0") != "0"
+
+_started = time.perf_counter()
+_timings = []
+_reported = False
+
+
+@contextmanager
+def timed(label: str):
+    """Record how long the wrapped block (usually a group of imports) took."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings.append((label, time.perf_counter() - start))
+
+
+def mark(label: str):
+    """Record the time elapsed since the process started importing main."""
+    _timings.append((label, time.perf_counter() - _started))
+
+
+def report() -> str:
+    lines = ["startup timings:"]
+    lines += [f"  {label:<32}{seconds * 1000:>9.1f} ms" for label, seconds in _timings]
+    return "\n".join(lines)
+
+
+def report_once():
+    global _reported
+    if STARTUP_REPORT and not _reported:
+        _reported = True
+        print(report(), file=sys.stderr, flush=True)
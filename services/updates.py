@@ -0,0 +1,108 @@
+import itertools
+import json
+import os
+import threading
+import weakref
+from services import metrics
+
+# How long updates requested by one handler are gathered before being sent
+UPDATE_DELAY = float(os.environ.get("UPDATE_DELAY", "0.015"))
+# Encode one update in this many to measure its size; encoding costs as much as sending
+UPDATE_SIZE_SAMPLE = int(os.environ.get("UPDATE_SIZE_SAMPLE", "10"))
+
+
+class UpdateScheduler:
+    """Sends one ``page.update()`` for every burst of requested updates.
+
+    Handlers call ``request()`` as often as they like; the page is diffed and
+    sent once, ``delay`` seconds after the first request of a burst, from a
+    timer of this session's own, so a slow session never holds up another's
+    updates. ``flush()`` sends straight away, for spinners shown before a
+    blocking call.
+    """
+
+    def __init__(self, page, delay: float = UPDATE_DELAY):
+        # Weak, so the per-page registry does not keep closed sessions alive
+        self._page = weakref.ref(page)
+        self.delay = delay
+        self.flushes = 0
+        self.requests = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def page(self):
+        return self._page()
+
+    def request(self):
+        with self._lock:
+            self.requests += 1
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self._update()
+
+    def _fire(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self._update()
+        except Exception:
+            # The session went away between the request and the flush
+            pass
+
+    def _update(self):
+        page = self.page
+        if page is not None:
+            self.flushes += 1
+            with metrics.update_seconds.time():
+                page.update()
+
+
+_schedulers = weakref.WeakKeyDictionary()
+_schedulers_lock = threading.Lock()
+
+
+def meter_connection(connection):
+    """Record the command count, and a sample of the encoded size, of every update."""
+    if getattr(connection, "metered", False):
+        return
+    from flet_core.protocol import CommandEncoder
+    send_commands = connection.send_commands
+    sent = itertools.count()
+
+    def count(commands) -> int:
+        return sum(1 + count(command.commands) for command in commands)
+
+    def metered_send_commands(session_id, commands):
+        metrics.update_commands.observe(count(commands))
+        if UPDATE_SIZE_SAMPLE and next(sent) % UPDATE_SIZE_SAMPLE == 0:
+            metrics.update_bytes.observe(len(json.dumps(commands, cls=CommandEncoder, separators=(",", ":"))))
+        return send_commands(session_id, commands)
+
+    connection.send_commands = metered_send_commands
+    connection.metered = True
+
+
+def scheduler_for(page) -> UpdateScheduler:
+    with _schedulers_lock:
+        scheduler = _schedulers.get(page)
+        if scheduler is None:
+            scheduler = _schedulers[page] = UpdateScheduler(page)
+        return scheduler
+
+
+def request_update(page):
+    scheduler_for(page).request()
+
+
+def flush_update(page):
+    scheduler_for(page).flush()
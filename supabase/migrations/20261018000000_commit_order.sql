@@ -0,0 +1,60 @@
+-- Atomic, idempotent order submission used by services.database.commit_order.
+-- Inserts the customer, every line item and the order header in one
+-- transaction and returns the order id. A retried call with the same
+-- idempotency key returns the order that was already committed.
+
+alter table public.orders add column if not exists idempotency_key uuid;
+create unique index if not exists orders_idempotency_key_key on public.orders (idempotency_key);
+
+create or replace function public.commit_order(
+    p_customer jsonb,
+    p_items jsonb,
+    p_payment_type text,
+    p_total numeric,
+    p_idempotency_key uuid
+) returns bigint
+language plpgsql
+as $$
+declare
+    v_order_id bigint;
+    v_user_id bigint;
+    v_detail_id bigint;
+begin
+    select id into v_order_id from public.orders where idempotency_key = p_idempotency_key;
+    if v_order_id is not null then
+        return v_order_id;
+    end if;
+
+    insert into public.users (name, email, phone, age)
+    values (p_customer ->> 'name',
+            nullif(p_customer ->> 'email', ''),
+            nullif(p_customer ->> 'phone', ''),
+            nullif(p_customer ->> 'age', '')::int)
+    returning id into v_user_id;
+
+    -- orders.detail_id points at the first line item, as the app always did
+    with inserted as (
+        insert into public.order_details (product_id, quantity)
+        select (item ->> 'product_id')::bigint, (item ->> 'quantity')::int
+        from jsonb_array_elements(p_items) as item
+        returning id
+    )
+    select min(id) into v_detail_id from inserted;
+
+    insert into public.orders (user_id, detail_id, payment_type, total, idempotency_key)
+    values (v_user_id, v_detail_id, p_payment_type, p_total, p_idempotency_key)
+    returning id into v_order_id;
+
+    return v_order_id;
+exception
+    when unique_violation then
+        -- A concurrent retry with the same key committed first
+        select id into v_order_id from public.orders where idempotency_key = p_idempotency_key;
+        if v_order_id is null then
+            raise;
+        end if;
+        return v_order_id;
+end;
+$$;
+
+grant execute on function public.commit_order(jsonb, jsonb, text, numeric, uuid) to anon, authenticated;
@@ -0,0 +1,32 @@
+-- Batched order submission for the local order journal flusher.
+-- Commits every order of the batch independently (one savepoint each) so a
+-- rejected order does not hold back the others, and reports one row per
+-- order. Replayed orders resolve to their existing id through commit_order.
+
+create or replace function public.commit_orders(p_orders jsonb)
+returns table (idempotency_key uuid, order_id bigint, error text)
+language plpgsql
+as $$
+declare
+    v_order jsonb;
+begin
+    for v_order in select value from jsonb_array_elements(p_orders) loop
+        idempotency_key := (v_order ->> 'idempotency_key')::uuid;
+        order_id := null;
+        error := null;
+        begin
+            order_id := public.commit_order(v_order -> 'customer',
+                                            v_order -> 'items',
+                                            v_order ->> 'payment_type',
+                                            (v_order ->> 'total')::numeric,
+                                            idempotency_key);
+        exception
+            when others then
+                error := sqlerrm;
+        end;
+        return next;
+    end loop;
+end;
+$$;
+
+grant execute on function public.commit_orders(jsonb) to anon, authenticated;
@@ -0,0 +1,81 @@
+-- Server-side dashboard aggregation (DASHBOARD_AGGREGATION=server).
+-- Returns today's KPIs and the top-selling tables as one small jsonb
+-- document, so the dashboard no longer downloads the order history.
+-- "Today" is the current calendar day in p_timezone for every figure.
+
+create index if not exists orders_created_at_idx on public.orders (created_at);
+create index if not exists order_details_created_at_idx on public.order_details (created_at);
+create index if not exists order_details_product_id_idx on public.order_details (product_id);
+
+create or replace function public.dashboard_summary(
+    p_timezone text default 'America/Sao_Paulo',
+    p_top int default 8
+) returns jsonb
+language sql
+stable
+as $$
+    with day as (
+        select date_trunc('day', now() at time zone p_timezone) at time zone p_timezone as day_start
+    ),
+    sold_per_age as (
+        select u.age, p.name, sum(d.quantity) as quantity
+        from public.orders o
+        join public.order_details d on d.id = o.detail_id
+        join public.products p on p.id = d.product_id
+        join public.users u on u.id = o.user_id
+        where u.age is not null
+        group by u.age, p.name
+    ),
+    best_per_age as (
+        select distinct on (age) age, name, quantity
+        from sold_per_age
+        order by age, quantity desc, name
+    ),
+    best_per_age_group as (
+        select distinct on (age_group) age_group, name, quantity
+        from (
+            select (10 + (age - 10) / 5 * 5)::text || '-' || (15 + (age - 10) / 5 * 5)::text as age_group,
+                   age, name, quantity
+            from best_per_age
+            where age >= 10 and age < 40
+        ) grouped
+        order by age_group, age
+    )
+    select jsonb_build_object(
+        'total_sold_today', (
+            select coalesce(round(sum(o.total)::numeric, 2), 0)
+            from public.orders o, day
+            where o.created_at >= day.day_start and o.created_at < day.day_start + interval '1 day'
+        ),
+        'orders_total_today', (
+            select count(*)
+            from public.orders o, day
+            where o.created_at >= day.day_start and o.created_at < day.day_start + interval '1 day'
+        ),
+        'products_sold_today', (
+            select coalesce(sum(d.quantity), 0)
+            from public.order_details d, day
+            where d.created_at >= day.day_start and d.created_at < day.day_start + interval '1 day'
+        ),
+        'most_sold_products', (
+            select coalesce(jsonb_agg(jsonb_build_object('name', name, 'quantity_order_details', quantity)
+                                      order by quantity desc, name), '[]'::jsonb)
+            from (
+                select p.name, sum(d.quantity) as quantity
+                from public.order_details d
+                join public.products p on p.id = d.product_id
+                group by p.name
+                order by quantity desc, p.name
+                limit p_top
+            ) top_products
+        ),
+        'most_sold_products_per_age', (
+            select coalesce(jsonb_agg(jsonb_build_object('age_group', age_group, 'name', name,
+                                                         'quantity_order_details', quantity)
+                                      order by age_group), '[]'::jsonb)
+            from best_per_age_group
+        )
+    )
+$$;
+
+grant execute on function public.dashboard_summary(text, int) to anon, authenticated;
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ORDER_JOURNAL_PATH", os.path.join(tempfile.mkdtemp(prefix="tests-"), "orders.db"))
+
+# services.database first: the memory backend imports it
+from services import database
+from services.catalog import catalog
+from services.memory_backend import MemoryBackend
+
+
+@pytest.fixture
+def backend():
+    """A fresh in-memory store behind services.database and an empty catalog cache."""
+    store = MemoryBackend()
+    database.use_backend(store)
+    catalog.invalidate()
+    yield store
+    catalog.invalidate()
@@ -0,0 +1,58 @@
+from services import catalog_io
+from services.catalog import catalog
+
+
+def write(tmp_path, text: str) -> str:
+    path = tmp_path / "planilha.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_price_list_keeps_columns_it_does_not_have(backend, tmp_path):
+    jeans = backend.insert_product({'name': "Calça Jeans", 'quantity': 40, 'price': 99.9,
+                                    'promotion_price': 79.0, 'category': "vestuário"})
+    cap = backend.insert_product({'name': "Boné", 'quantity': 5, 'price': 30.0,
+                                  'promotion_price': 0, 'category': "acessórios"})
+
+    report = catalog_io.import_products(write(tmp_path, "nome,preço\nCalça Jeans,\"119,90\"\nboné,35\n"))
+
+    assert report.errors == []
+    assert report.imported == 2
+    assert backend.products[jeans['id']] == {**jeans, 'price': 119.9}
+    assert backend.products[cap['id']]['price'] == 35.0
+    assert backend.products[cap['id']]['quantity'] == 5
+
+
+def test_mixed_columns_update_only_what_each_row_has(backend, tmp_path):
+    jeans = backend.insert_product({'name': "Calça Jeans", 'quantity': 40, 'price': 99.9,
+                                    'promotion_price': 79.0, 'category': "vestuário"})
+
+    report = catalog_io.import_products(write(tmp_path, "nome,estoque,preço\nCalça Jeans,12,\nMeia,3,9\n"))
+
+    assert report.errors == []
+    assert backend.products[jeans['id']]['quantity'] == 12
+    assert backend.products[jeans['id']]['price'] == 99.9
+    assert backend.products[jeans['id']]['promotion_price'] == 79.0
+    created = [product for product in backend.products.values() if product['name'] == "Meia"]
+    assert created and created[0]['category'] is None and created[0]['promotion_price'] == 0.0
+
+
+def test_supplier_code_is_not_our_id(backend, tmp_path):
+    first = backend.insert_product({'name': "Camiseta", 'quantity': 1, 'price': 50, 'promotion_price': 0,
+                                    'category': "a"})
+
+    report = catalog_io.import_products(write(tmp_path, f"código,nome,preço\n{first['id']},Tênis,200\n"))
+
+    assert report.errors == []
+    assert backend.products[first['id']]['name'] == "Camiseta"
+    assert sorted(product['name'] for product in catalog.get()) == ["Camiseta", "Tênis"]
+
+
+def test_unknown_id_is_an_error(backend, tmp_path):
+    backend.insert_product({'name': "Camiseta", 'quantity': 1, 'price': 50, 'promotion_price': 0, 'category': "a"})
+
+    report = catalog_io.import_products(write(tmp_path, "id,nome,preço\n999,Tênis,200\n"))
+
+    assert report.imported == 0
+    assert report.errors == [(2, "id desconhecido: 999")]
+    assert 999 not in backend.products
@@ -0,0 +1,40 @@
+import pytest
+from benchmarks.synthetic import seed_store
+from pages import dashboard
+from services.catalog import catalog
+
+
+def test_failed_refresh_loses_no_orders(backend, monkeypatch):
+    seed_store(backend, 20, 50)
+    charts = dashboard.Charts()
+    backend.commit_order({'name': "cliente"}, [{'product_id': 1, 'quantity': 1}], "Pix", 10.0, "late-order")
+
+    def offline(force: bool = False):
+        raise Exception("offline")
+
+    monkeypatch.setattr(catalog, "get", offline)
+    with pytest.raises(Exception):
+        charts.refresh()
+    monkeypatch.undo()
+    charts.refresh()
+
+    assert len(charts.orders_df) == len(backend.orders) == 51
+    assert len(charts.final_merged_df) == 51
+
+
+def test_failed_first_snapshot_is_retried_on_demand():
+    scheduler = dashboard.SnapshotScheduler(interval=300, min_interval=0, retry_interval=300)
+    supabase = {'up': False}
+
+    def compute():
+        if not supabase['up']:
+            raise Exception("timeout")
+        return "snapshot"
+
+    scheduler.compute = compute
+    with pytest.raises(Exception, match="timeout"):
+        scheduler.get()
+
+    # Well before retry_interval: opening the dashboard asks for a new attempt
+    supabase['up'] = True
+    assert scheduler.get() == "snapshot"
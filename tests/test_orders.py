@@ -0,0 +1,106 @@
+import time
+import pytest
+from services import database
+from services.journal import OrderJournal
+from services.orders import OrderFlusher, PendingOrder
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return OrderJournal(str(tmp_path / "orders.db"))
+
+
+@pytest.fixture
+def product(backend):
+    return backend.insert_product({'name': "Calça Jeans", 'quantity': 40, 'price': 99.9,
+                                   'promotion_price': 0, 'category': "vestuário"})
+
+
+def make_order(product_id, key="order-1") -> PendingOrder:
+    return PendingOrder({'name': "cliente", 'email': None, 'phone': None, 'age': None},
+                        [{'product_id': product_id, 'quantity': 2, 'price': 99.9}], "Pix", 199.8, key)
+
+
+def wait_until(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_lost_acknowledgement_is_replayed_once(backend, product, journal, monkeypatch):
+    commit_orders = backend.commit_orders
+    calls = []
+
+    def lost_ack(orders):
+        # Supabase stores the batch, but the response never arrives
+        results = commit_orders(orders)
+        calls.append(results)
+        if len(calls) == 1:
+            raise Exception("connection reset")
+        return results
+
+    monkeypatch.setattr(database, "commit_orders", lost_ack)
+    statuses = []
+    pending = make_order(product['id'])
+    OrderFlusher(journal).submit(pending, on_done=lambda order: statuses.append(order.status))
+
+    assert pending.wait(5)
+    assert statuses == ["retrying", "committed"]
+    assert pending.order_id == calls[0][0]["order_id"] == calls[1][0]["order_id"]
+    assert len(backend.orders) == 1
+    assert journal.counts() == {"committed": 1}
+
+
+def test_rejected_order_can_be_resubmitted(backend, journal):
+    pending = make_order(product_id=1)
+    flusher = OrderFlusher(journal)
+    flusher.submit(pending)
+
+    assert pending.wait(5)
+    assert pending.status == "failed"
+    assert journal.counts() == {"failed": 1}
+
+    backend.insert_product({'name': "Boné", 'quantity': 1, 'price': 99.9, 'promotion_price': 0, 'category': None})
+    flusher.submit(pending)
+
+    assert pending.wait(5)
+    assert pending.status == "committed"
+    assert journal.counts() == {"committed": 1}
+    assert len(backend.orders) == 1
+
+
+def test_rejected_order_can_be_discarded(backend, journal):
+    pending = make_order(product_id=1)
+    flusher = OrderFlusher(journal)
+    flusher.submit(pending)
+    assert pending.wait(5)
+
+    flusher.discard(pending)
+
+    assert journal.counts() == {}
+    assert flusher._watchers == {}
+    assert backend.orders == {}
+
+
+def test_pending_orders_are_flushed_after_a_restart(backend, product, tmp_path, monkeypatch):
+    path = str(tmp_path / "orders.db")
+
+    def offline(orders):
+        raise Exception("offline")
+
+    monkeypatch.setattr(database, "commit_orders", offline)
+    before = OrderJournal(path)
+    for number in range(3):
+        before.append(make_order(product['id'], key=f"order-{number}").payload())
+    with pytest.raises(Exception):
+        OrderFlusher(before).flush()
+    monkeypatch.undo()
+
+    # A new process opens the same journal
+    after = OrderJournal(path)
+    assert after.counts() == {"pending": 3}
+    OrderFlusher(after).start()
+
+    wait_until(lambda: after.counts() == {"committed": 3})
+    assert sorted(order["idempotency_key"] for order in backend.orders.values()) == ["order-0", "order-1", "order-2"]
@@ -0,0 +1,15 @@
+import pytest
+from benchmarks.synthetic import make_products
+from services.search import SearchIndex, matches
+
+PRODUCTS = [{'id': number, **product} for number, product in enumerate(make_products(2000, seed=1))]
+
+
+@pytest.mark.parametrize("query", ["calca", "bo", "a", "azu ve", "oversized cargo 1", "s 12", "xyz", "TÊNIS"])
+def test_unranked_search_is_the_filter_in_catalog_order(query):
+    index = SearchIndex(PRODUCTS)
+    expected = [product for product in PRODUCTS if matches(product, query)]
+
+    assert index.search(query, rank=False) == expected
+    assert sorted(index.search(query), key=lambda product: product['id']) == expected
+    assert index.search(query, rank=False, limit=5) == expected[:5]